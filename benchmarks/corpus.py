@@ -0,0 +1,136 @@
+"""
+Синтетические наборы изображений для бенчмарков
+
+Изображения генерируются детерминированно (по seed), поэтому наборы
+одинаковы на любой машине и между запусками. Сгенерированное
+кэшируется в каталоге корпуса и повторно не создаётся.
+"""
+import os
+import random
+from typing import Dict, List
+
+from PIL import Image, ImageDraw
+
+# Сколько разных изображений генерировать на вид; большие задания
+# повторяют их по кругу, чтобы корпус не занимал гигабайты
+POOL_SIZE = 50
+
+
+def _noise(rng: random.Random, size: tuple, mode: str = 'L') -> Image.Image:
+    """Шумовая текстура: небольшой случайный тайл, растянутый на размер."""
+    tile = (64, 64)
+    bands = len(mode)
+    data = rng.randbytes(tile[0] * tile[1] * bands)
+    return Image.frombytes(mode, tile, data).resize(size, Image.Resampling.BICUBIC)
+
+
+def phone_photo(rng: random.Random) -> Image.Image:
+    """Фото с телефона: 12 Мп, плавные градиенты и зерно."""
+    size = (4032, 3024)
+    gradient = Image.linear_gradient('L').resize(size)
+    image = Image.merge('RGB', (
+        gradient,
+        _noise(rng, size),
+        gradient.rotate(90, expand=False).resize(size),
+    ))
+    grain = Image.frombytes('RGB', (size[0] // 4, size[1] // 4),
+                            rng.randbytes(size[0] * size[1] * 3 // 16))
+    return Image.blend(image, grain.resize(size), 0.15)
+
+
+def screenshot(rng: random.Random) -> Image.Image:
+    """Скриншот телефона: однотонные блоки и «строки текста»."""
+    size = (1170, 2532)
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    y = 80
+    while y < size[1] - 60:
+        if rng.random() < 0.15:
+            color = tuple(rng.randrange(256) for _ in range(3))
+            height = rng.randrange(120, 400)
+            draw.rounded_rectangle((40, y, size[0] - 40, y + height), 24, fill=color)
+            y += height + 30
+            continue
+        x = 40
+        while x < size[0] - 80:
+            width = rng.randrange(30, 160)
+            draw.rectangle((x, y, x + width, y + 22), fill=(30, 30, 30))
+            x += width + 14
+        y += 44
+    return image
+
+
+def rgba_overlay(rng: random.Random) -> Image.Image:
+    """PNG с прозрачностью (стикеры, экспорт из редакторов)."""
+    size = (1600, 1600)
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        box = sorted(rng.randrange(size[0]) for _ in range(2)) + \
+            sorted(rng.randrange(size[1]) for _ in range(2))
+        color = tuple(rng.randrange(256) for _ in range(3)) + (rng.randrange(60, 255),)
+        draw.ellipse((box[0], box[2], box[1], box[3]), fill=color)
+    return image
+
+
+def palette(rng: random.Random) -> Image.Image:
+    """Изображение с палитрой (GIF/PNG-8, схемы, диаграммы)."""
+    return screenshot(rng).resize((900, 1600)).convert(
+        'P', palette=Image.Palette.ADAPTIVE, colors=64)
+
+
+KINDS: Dict[str, tuple] = {
+    # вид: (генератор, формат, расширение, параметры сохранения)
+    'phone_jpeg': (phone_photo, 'JPEG', 'jpg', {'quality': 92}),
+    'screenshot_png': (screenshot, 'PNG', 'png', {}),
+    'rgba_png': (rgba_overlay, 'PNG', 'png', {}),
+    'palette_png': (palette, 'PNG', 'png', {}),
+}
+
+
+def _pool(root: str, kind: str, size: int) -> List[str]:
+    """Сгенерировать (или взять готовые) size уникальных изображений вида."""
+    generator, fmt, ext, options = KINDS[kind]
+    directory = os.path.join(root, 'pool', kind)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(size):
+        path = os.path.join(directory, f'{index:04d}.{ext}')
+        if not os.path.exists(path):
+            rng = random.Random(f'{kind}-{index}')
+            tmp_path = path + '.part'
+            generator(rng).save(tmp_path, format=fmt, **options)
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def build_job(root: str, kind: str, pages: int) -> str:
+    """
+    Каталог задания из pages файлов вида kind
+
+    Файлы - жёсткие ссылки на изображения из пула (копии, если ссылки
+    не поддерживаются), имена как у загрузок бота.
+    """
+    directory = os.path.join(root, 'jobs', f'{kind}_{pages}')
+    pool = _pool(root, kind, min(pages, POOL_SIZE))
+    if os.path.isdir(directory) and len(os.listdir(directory)) == pages:
+        return directory
+    os.makedirs(directory, exist_ok=True)
+    for index in range(pages):
+        source = pool[index % len(pool)]
+        target = os.path.join(directory, f'{index:04d}_{os.path.basename(source)}')
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(source, target)
+        except OSError:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                dst.write(src.read())
+    return directory
+
+
+def sample(root: str, kind: str) -> str:
+    """Одно изображение вида kind (для замера compress_image)."""
+    return _pool(root, kind, 1)[0]
+
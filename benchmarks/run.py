@@ -0,0 +1,299 @@
+"""
+Бенчмарк конвертации изображений в PDF
+
+Каждый замер выполняется в отдельном процессе, чтобы пиковая память
+(VmHWM из /proc/self/status, без Linux - ru_maxrss) относилась только к
+нему. Кэш страниц отключается.
+
+    python -m benchmarks.run                       # все сценарии кроме тяжёлых
+    python -m benchmarks.run --all --repeat 5
+    python -m benchmarks.run --case pdf_phone_jpeg_50 --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+При сравнении с baseline код возврата 1, если какая-то метрика
+выросла больше чем на --threshold (по умолчанию 10%).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from benchmarks import corpus
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, '.corpus')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+
+# сценарий: (что замеряем, вид изображений, страниц, тяжёлый)
+CASES: Dict[str, tuple] = {
+    'pdf_phone_jpeg_1': ('pdf', 'phone_jpeg', 1, False),
+    'pdf_phone_jpeg_50': ('pdf', 'phone_jpeg', 50, False),
+    'pdf_phone_jpeg_300': ('pdf', 'phone_jpeg', 300, True),
+    'pdf_screenshot_png_50': ('pdf', 'screenshot_png', 50, False),
+    'pdf_rgba_png_50': ('pdf', 'rgba_png', 50, False),
+    'pdf_palette_png_50': ('pdf', 'palette_png', 50, False),
+    'compress_phone_jpeg': ('compress', 'phone_jpeg', 1, False),
+    'compress_screenshot_png': ('compress', 'screenshot_png', 1, False),
+    'compress_rgba_png': ('compress', 'rgba_png', 1, False),
+    'compress_palette_png': ('compress', 'palette_png', 1, False),
+}
+
+# Метрики, где меньше - лучше; по ним ищем регрессии
+METRICS = ('wall_s', 'cpu_s', 'peak_rss_mb', 'bytes_per_page')
+
+
+def peak_rss_mb() -> float:
+    """Пиковая память процесса в МБ."""
+    # VmHWM сбрасывается при exec, а ru_maxrss на Linux наследуется
+    # от родителя (а он держал в памяти генерацию корпуса)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS - байты
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def run_child(case: str, corpus_dir: str, workers: Optional[int],
+              streaming: bool, compress_rounds: int) -> dict:
+    """Один замер внутри дочернего процесса."""
+    import logging
+
+    # Логи конвертера на каждую страницу искажают время
+    logging.disable(logging.CRITICAL)
+
+    from core.constants import (CONVERT_MAX_HEIGHT, CONVERT_MAX_WIDTH,
+                                CONVERT_QUALITY)
+    from utils.image_converter import compress_image, image_converter_to_pdf
+
+    target, kind, pages, _ = CASES[case]
+    rss_before = peak_rss_mb()
+
+    if target == 'pdf':
+        input_dir = os.path.join(corpus_dir, 'jobs', f'{kind}_{pages}')
+        output_dir = tempfile.mkdtemp(prefix='bench_out_')
+        try:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            result = image_converter_to_pdf(
+                input_dir, output_dir, 0,
+                quality=CONVERT_QUALITY,
+                max_width=CONVERT_MAX_WIDTH,
+                max_height=CONVERT_MAX_HEIGHT,
+                workers=workers,
+                streaming=streaming,
+            )
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if result is None:
+                raise RuntimeError(f'{case}: PDF не создан')
+            output_bytes = os.path.getsize(result)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    else:
+        source = os.path.join(corpus_dir, 'pool', kind)
+        source = os.path.join(source, sorted(os.listdir(source))[0])
+        pages = compress_rounds
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        output_bytes = 0
+        for _ in range(compress_rounds):
+            output_bytes += len(compress_image(
+                source,
+                quality=CONVERT_QUALITY,
+                max_size=(CONVERT_MAX_WIDTH, CONVERT_MAX_HEIGHT),
+                use_cache=False,
+            ))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+
+    return {
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'import_rss_mb': round(rss_before, 1),
+        'output_bytes': output_bytes,
+        'pages': pages,
+        'bytes_per_page': round(output_bytes / pages),
+    }
+
+
+def measure(case: str, args) -> dict:
+    """Запустить сценарий args.repeat раз в отдельных процессах, взять медиану."""
+    runs = []
+    env = dict(os.environ, PAGE_CACHE_MAX_BYTES='0')
+    for _ in range(args.repeat):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            result_path = f.name
+        try:
+            command = [
+                sys.executable, '-m', 'benchmarks.run',
+                '--child', case,
+                '--result-file', result_path,
+                '--corpus', args.corpus,
+                '--compress-rounds', str(args.compress_rounds),
+                '--streaming' if args.streaming else '--no-streaming',
+            ]
+            if args.workers is not None:
+                command += ['--workers', str(args.workers)]
+            subprocess.run(command, cwd=PROJECT_DIR, env=env, check=True)
+            with open(result_path) as f:
+                runs.append(json.load(f))
+        finally:
+            os.unlink(result_path)
+
+    summary = {key: round(statistics.median(run[key] for run in runs), 4)
+               for key in runs[0]}
+    summary['wall_s_min'] = min(run['wall_s'] for run in runs)
+    summary['repeat'] = len(runs)
+    return summary
+
+
+def prepare_corpus(cases: List[str], corpus_dir: str) -> None:
+    for case in cases:
+        target, kind, pages, _ = CASES[case]
+        started = time.perf_counter()
+        if target == 'pdf':
+            corpus.build_job(corpus_dir, kind, pages)
+        else:
+            corpus.sample(corpus_dir, kind)
+        elapsed = time.perf_counter() - started
+        if elapsed > 1:
+            print(f'  корпус {case}: {elapsed:.1f} с')
+
+
+def environment() -> dict:
+    import img2pdf
+    import PIL
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+            capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'img2pdf': img2pdf.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Список регрессий относительно baseline."""
+    regressions = []
+    for case, current in results['cases'].items():
+        base = baseline.get('cases', {}).get(case)
+        if base is None:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = ''
+            if change > threshold:
+                marker = '  <-- регрессия'
+                regressions.append(f'{case}.{metric}: {old} -> {new} ({change:+.1%})')
+            print(f'  {case:28} {metric:15} {old:>12} -> {new:>12} ({change:+.1%}){marker}')
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='сценарий (можно несколько раз); по умолчанию все лёгкие')
+    parser.add_argument('--all', action='store_true', help='включая тяжёлые сценарии')
+    parser.add_argument('--repeat', type=int, default=3, help='повторов на сценарий')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='потоков сжатия страниц (по умолчанию число ядер)')
+    parser.add_argument('--streaming', action=argparse.BooleanOptionalAction, default=True,
+                        help='постраничная запись PDF')
+    parser.add_argument('--compress-rounds', type=int, default=5,
+                        help='повторов compress_image в сценариях compress_*')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='каталог корпуса')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='куда сохранить JSON')
+    parser.add_argument('--baseline', help='JSON для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='допустимый рост метрики (0.10 = 10%%)')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='сохранить результаты ещё и как baseline')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.child:
+        result = run_child(args.child, args.corpus, args.workers,
+                           args.streaming, args.compress_rounds)
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f)
+        return 0
+
+    cases = args.case or [name for name, spec in CASES.items() if args.all or not spec[3]]
+
+    print('Подготовка корпуса...')
+    prepare_corpus(cases, args.corpus)
+
+    results = {
+        'environment': environment(),
+        'settings': {
+            'workers': args.workers,
+            'streaming': args.streaming,
+            'repeat': args.repeat,
+            'compress_rounds': args.compress_rounds,
+        },
+        'cases': {},
+    }
+    for case in cases:
+        summary = measure(case, args)
+        results['cases'][case] = summary
+        print(f'{case:28} {summary["wall_s"]:8.3f} с  cpu {summary["cpu_s"]:8.3f} с  '
+              f'rss {summary["peak_rss_mb"]:7.1f} МБ  '
+              f'{summary["bytes_per_page"] / 1024:8.1f} КБ/стр')
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'Результаты сохранены: {path}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f'Сравнение с {args.baseline} (порог {args.threshold:.0%}):')
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('Регрессии:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print('Регрессий нет')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,2 +1,8 @@
 INPUT_PATH_NAME='IN'
 OUTPUT_PATH_NAME='OUT'
+MANIFEST_NAME='manifest.json'
+
+# Настройки сжатия страниц при конвертации
+CONVERT_QUALITY=75        # 75% - хороший баланс
+CONVERT_MAX_WIDTH=1200    # Ограничиваем ширину
+CONVERT_MAX_HEIGHT=1800   # Ограничиваем высоту
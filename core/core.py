@@ -5,3 +5,131 @@ load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://postgres:converter_password@db:5432/pdf_converter")
+
+# Пул для конвертации: "thread" (Pillow отпускает GIL) или "process"
+CONVERTER_EXECUTOR = os.getenv("CONVERTER_EXECUTOR", "thread")
+CONVERTER_WORKERS = int(os.getenv("CONVERTER_WORKERS", "2"))
+# Максимум одновременных задач конвертации и таймаут одной задачи (сек)
+CONVERTER_MAX_JOBS = int(os.getenv("CONVERTER_MAX_JOBS", "2"))
+CONVERTER_JOB_TIMEOUT = float(os.getenv("CONVERTER_JOB_TIMEOUT", "300"))
+# Потоков для параллельного сжатия страниц внутри одной задачи (0 = по числу ядер)
+CONVERTER_PAGE_WORKERS = int(os.getenv("CONVERTER_PAGE_WORKERS", "0")) or None
+# Постраничная запись PDF: в памяти держится около одной страницы на поток
+CONVERTER_STREAMING_PDF = os.getenv("CONVERTER_STREAMING_PDF", "true").lower() == "true"
+
+# Дисковый кэш сжатых страниц (PAGE_CACHE_MAX_BYTES=0 - отключён)
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pdf-bot", "pages")
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(24 * 60 * 60)))
+
+# Сколько /convert ждёт незавершённые загрузки файлов (сек)
+DOWNLOAD_WAIT_TIMEOUT = float(os.getenv("DOWNLOAD_WAIT_TIMEOUT", "60"))
+# Сжимать страницы сразу после загрузки, а не по /convert (нужен кэш страниц)
+EAGER_COMPRESSION = os.getenv("EAGER_COMPRESSION", "false").lower() == "true"
+# Потоки заранее сжатия (с пониженным приоритетом) и сколько страниц ждут в
+# очереди; лишние страницы сжимаются уже при /convert
+EAGER_COMPRESSION_WORKERS = int(os.getenv("EAGER_COMPRESSION_WORKERS", "1"))
+EAGER_COMPRESSION_QUEUE = int(os.getenv("EAGER_COMPRESSION_QUEUE", "100"))
+
+# Хранение загрузок в памяти вместо папки IN (лишнее сбрасывается на диск)
+MEMORY_STAGING = os.getenv("MEMORY_STAGING", "false").lower() == "true"
+MEMORY_STAGING_USER_BYTES = int(os.getenv("MEMORY_STAGING_USER_BYTES", str(64 * 1024 * 1024)))
+MEMORY_STAGING_TOTAL_BYTES = int(os.getenv("MEMORY_STAGING_TOTAL_BYTES", str(128 * 1024 * 1024)))
+MEMORY_STAGING_MAX_FILE_BYTES = int(os.getenv("MEMORY_STAGING_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+
+# Хранилище временных файлов: local, tmpfs или quota (лимит на пользователя)
+TEMP_STORAGE_BACKEND = os.getenv("TEMP_STORAGE_BACKEND", "local")
+TEMP_ROOT = os.getenv("TEMP_ROOT") or None  # None - по умолчанию для бэкенда
+TEMP_USER_QUOTA_BYTES = int(os.getenv("TEMP_USER_QUOTA_BYTES", str(200 * 1024 * 1024)))
+
+# Фоновая уборка temp: интервал, возраст и общий объём (сек/байт)
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", "600"))
+TEMP_MAX_AGE = float(os.getenv("TEMP_MAX_AGE", str(24 * 60 * 60)))
+TEMP_MAX_TOTAL_BYTES = int(os.getenv("TEMP_MAX_TOTAL_BYTES", str(1024 * 1024 * 1024)))
+# Недавно активные папки не трогаем даже при превышении объёма
+JANITOR_GRACE_PERIOD = float(os.getenv("JANITOR_GRACE_PERIOD", "600"))
+
+# Кэш известных пользователей: сколько держать и как долго (сек)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+
+# Пул соединений с БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Пересоздавать соединения старше N сек, пока их не закрыл Postgres
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Как часто писать состояние пула в лог (0 - не писать)
+DB_POOL_STATS_INTERVAL = float(os.getenv("DB_POOL_STATS_INTERVAL", "300"))
+
+# Пакетная запись статистики конвертаций
+STATS_BATCH_SIZE = int(os.getenv("STATS_BATCH_SIZE", "50"))
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "10"))
+STATS_MAX_PENDING = int(os.getenv("STATS_MAX_PENDING", "10000"))
+# После стольких неудачных попыток подряд пакет отбрасывается
+STATS_MAX_RETRIES = int(os.getenv("STATS_MAX_RETRIES", "5"))
+
+# Схема БД при старте: check (только проверка ревизии), upgrade, create_all.
+# upgrade - только для одного процесса: реплики и воркеры мигрировали бы наперегонки
+DB_MIGRATIONS = os.getenv("DB_MIGRATIONS", "check")
+
+# Очередь конвертаций: одновременно выполняемые задачи (конвертация + отправка),
+# сколько премиум-задач запускается на одну обычную, предел очереди
+SCHEDULER_MAX_ACTIVE = int(os.getenv("SCHEDULER_MAX_ACTIVE", "4"))
+SCHEDULER_PREMIUM_WEIGHT = int(os.getenv("SCHEDULER_PREMIUM_WEIGHT", "3"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "200"))
+# Как часто обновлять сообщение с позицией в очереди, сек
+SCHEDULER_POSITION_INTERVAL = float(os.getenv("SCHEDULER_POSITION_INTERVAL", "10"))
+
+# HTTP-эндпоинт /metrics (METRICS_PORT=0 - отключён)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Логирование: общий уровень, уровни по модулям
+# (например "utils.image_converter=WARNING,aiogram=INFO"), файл в LOG_DIR
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FILE_ENABLED = os.getenv("LOG_FILE_ENABLED", "true").lower() == "true"
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+
+# Получение обновлений: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Свой адрес Bot API (локальный telegram-bot-api или тестовая заглушка)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL") or None
+
+# Webhook: адрес, который слушает бот, и публичный URL для setWebhook
+# (пустой WEBHOOK_URL - webhook регистрируется вручную или балансировщиком)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or None
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+# Сколько обновлений обрабатывается одновременно; сверх лимита ждём
+# WEBHOOK_ACQUIRE_TIMEOUT сек и отвечаем 503 - Telegram повторит доставку
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "64"))
+WEBHOOK_ACQUIRE_TIMEOUT = float(os.getenv("WEBHOOK_ACQUIRE_TIMEOUT", "5"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Конвертация: local - в процессе бота, distributed - отдельными воркерами
+# (worker.py) через таблицу conversion_jobs. Для distributed TEMP_ROOT должен
+# быть общим для бота и воркеров и смонтирован по одному и тому же пути
+CONVERSION_MODE = os.getenv("CONVERSION_MODE", "local")
+# Воркер: как часто искать задачи и продлевать взятую, сек; через сколько
+# секунд без heartbeat задачу забирает другой воркер; попыток на задачу
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Сколько задач воркер выполняет одновременно и его имя в conversion_jobs
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", str(CONVERTER_MAX_JOBS)))
+WORKER_ID = os.getenv("WORKER_ID") or None  # None - hostname-pid
+# Порт /metrics воркера: отдельный, чтобы воркер мог работать рядом с ботом
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9109"))
+# Бот: как часто проверять готовые задачи, сколько хранить доставленные, сек
+DELIVERY_POLL_INTERVAL = float(os.getenv("DELIVERY_POLL_INTERVAL", "1"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
@@ -1,48 +1,141 @@
+import atexit
 import logging
+import multiprocessing
 import os
+import queue
 import sys
-from datetime import datetime
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import (QueueHandler, QueueListener,
+                              TimedRotatingFileHandler)
+from typing import Dict, List, Optional
 
+from core.core import (LOG_BACKUP_COUNT, LOG_DIR, LOG_FILE_ENABLED, LOG_LEVEL,
+                       LOG_LEVELS)
 
-def setup_logger(name=None):
-    """Настройка и возврат логгера"""
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+LOG_DATE_FORMAT = '%d.%m.%Y %H:%M:%S'
 
-    # Создаем папку для логов, если её нет
-    log_dir = 'logs'
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+_configured = False
+_listener: Optional[QueueListener] = None
+_handlers: List[logging.Handler] = []
+# Очередь и поток вывода для записей из процессов пула конвертации
+_child_queue = None
+_child_listener: Optional[QueueListener] = None
 
-    # Имя логгера
-    if name is None:
-        name = __name__
 
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+def parse_levels(value: str) -> Dict[str, int]:
+    """Уровни по модулям из строки вида 'utils.image_converter=WARNING,aiogram=INFO'."""
+    levels = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, level = item.partition('=')
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def _install_queue_handler(log_queue) -> None:
+    """Корневой логгер пишет только в очередь; уровни из LOG_LEVEL/LOG_LEVELS."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.getLevelName(LOG_LEVEL.upper()))
+
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
 
-    # Проверяем, нет ли уже обработчиков у логгера
-    if logger.handlers:
-        return logger
 
-    # Форматтер
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        datefmt='%d.%m.%Y %H:%M:%S'
-    )
+def configure_logging() -> None:
+    """
+    Настроить логирование процесса (повторные вызовы ничего не делают)
+
+    Логгеры пишут записи в очередь (QueueHandler на корневом логгере),
+    а вывод в консоль и файл делает отдельный поток QueueListener.
+    Медленный диск или забитый stdout не останавливают event loop.
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
 
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # Обработчик для файла с ротацией
-    log_file = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d")}.log')
-    file_handler = TimedRotatingFileHandler(
-        filename=log_file,
-        when='D',
-        backupCount=7,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-
-    return logger
+    if LOG_FILE_ENABLED:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        file_handler = TimedRotatingFileHandler(
+            filename=os.path.join(LOG_DIR, 'app.log'),
+            when='midnight',
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+            delay=True
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _install_queue_handler(log_queue)
+
+    _handlers[:] = handlers
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Дописать всё из очереди при выходе
+    atexit.register(stop_logging)
+
+
+def get_child_log_queue():
+    """
+    Очередь для логов дочерних процессов (пул конвертации)
+
+    Поток QueueListener есть только в родительском процессе, поэтому
+    процессы пула отправляют записи через multiprocessing.Queue, а
+    выводит их второй поток родителя в те же консоль и файл.
+    """
+    global _child_queue, _child_listener
+    configure_logging()
+    if _child_queue is None:
+        _child_queue = multiprocessing.Queue()
+        _child_listener = QueueListener(_child_queue, *_handlers,
+                                        respect_handler_level=True)
+        _child_listener.start()
+    return _child_queue
+
+
+def configure_child_logging(log_queue) -> None:
+    """Инициализатор процесса пула: логи уходят в очередь родителя."""
+    global _configured, _listener, _child_queue, _child_listener
+    # После fork унаследованные потоки вывода в этом процессе не работают
+    _configured = True
+    _listener = None
+    _child_queue = None
+    _child_listener = None
+    _install_queue_handler(log_queue)
+
+
+def stop_logging() -> None:
+    """Остановить потоки вывода, дописав оставшиеся записи."""
+    global _listener, _child_listener
+    if _child_listener is not None:
+        _child_listener.stop()
+        _child_listener = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(name=None):
+    """Настройка и возврат логгера"""
+
+    configure_logging()
+
+    # Имя логгера
+    if name is None:
+        name = __name__
+
+    # Уровень и обработчики наследуются от корневого логгера
+    return logging.getLogger(name)
@@ -1,6 +1,6 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -26,6 +26,45 @@ class CRUDBase:
             select(self.model).offset(skip).limit(limit))
         return result.scalars().all()
 
+    async def get_page_after(
+            self,
+            session: AsyncSession,
+            *,
+            after_id: Optional[int] = None,
+            limit: int = 100,
+            where: Sequence[Any] = (),
+    ):
+        """
+        Получить страницу объектов после указанного ID (keyset-пагинация).
+
+        В отличие от OFFSET, стоимость не растёт с номером страницы:
+        поиск идёт по первичному ключу. where - дополнительные условия.
+        """
+        query = select(self.model).where(*where)
+        if after_id is not None:
+            query = query.where(self.model.id > after_id)
+        result = await session.execute(
+            query.order_by(self.model.id).limit(limit))
+        return result.scalars().all()
+
+    async def iter_all(
+            self,
+            session: AsyncSession,
+            *,
+            batch_size: int = 500,
+            where: Sequence[Any] = (),
+    ) -> AsyncIterator[Any]:
+        """Обойти все объекты пачками по batch_size через keyset-пагинацию."""
+        after_id = None
+        while True:
+            batch = await self.get_page_after(
+                session, after_id=after_id, limit=batch_size, where=where)
+            for obj in batch:
+                yield obj
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1].id
+
     async def create(self, session: AsyncSession, data: Dict[str, Any]):
         """Создать новый объект."""
 
@@ -35,6 +74,19 @@ class CRUDBase:
         await session.refresh(obj)
         return obj
 
+    async def create_many(self, session: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+        """
+        Создать несколько объектов одним пакетным INSERT (executemany).
+
+        Строки могут различаться набором ключей: недостающие колонки
+        получают значения по умолчанию.
+        """
+        if not rows:
+            return 0
+        await session.execute(insert(self.model), rows)
+        await session.commit()
+        return len(rows)
+
     async def update(self, session: AsyncSession, id: int, data: Dict[str, Any]):
         """Обновить объект."""
         await session.execute(
@@ -43,7 +95,7 @@ class CRUDBase:
             .values(**data)
         )
         await session.commit()
-        return await self.get(id)
+        return await self.get(id, session)
 
     async def delete(self, session: AsyncSession, id: int) -> bool:
         """Удалить объект."""
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base import CRUDBase
+from database.models import ConversionJob, Converting
+
+# Пауза перед повтором после ошибки: 10, 20, 40... сек
+RETRY_BACKOFF = 10
+
+
+class ConversionJobRepository(CRUDBase):
+    """
+    Очередь задач конвертации в БД
+
+    Воркеры забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED:
+    строки, уже заблокированные другим воркером, пропускаются, поэтому
+    одну задачу не получат двое. Задача с heartbeat_at старше
+    visibility_timeout считается брошенной (воркер упал) и снова
+    доступна. Все изменения задачи воркером проверяют worker_id: если
+    задачу уже перехватили, запоздалый результат не записывается.
+    """
+
+    def __init__(self):
+        super().__init__(ConversionJob)
+
+    async def enqueue(
+            self,
+            session: AsyncSession,
+            telegram_id: int,
+            chat_id: int,
+            message_id: int,
+            input_dir: str,
+            output_dir: str,
+            number_of_files: int,
+            settings: Dict[str, Any],
+            is_premium: bool = False,
+            priority: int = 0,
+            max_attempts: int = 3,
+    ) -> Optional[ConversionJob]:
+        """
+        Поставить задачу в очередь
+
+        Returns:
+            задачу или None, если у пользователя уже есть задача в очереди
+            или в работе (её успела поставить другая реплика бота)
+        """
+        now = datetime.now()
+        job = ConversionJob(
+            telegram_id=telegram_id,
+            chat_id=chat_id,
+            message_id=message_id,
+            is_premium=is_premium,
+            status=ConversionJob.QUEUED,
+            priority=priority,
+            input_dir=input_dir,
+            output_dir=output_dir,
+            settings=settings,
+            number_of_files=number_of_files,
+            attempts=0,
+            max_attempts=max_attempts,
+            created_at=now,
+            available_at=now,
+        )
+        session.add(job)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Сработал уникальный индекс uq_conversion_jobs_active_user
+            await session.rollback()
+            return None
+        return job
+
+    async def get_active_for_user(self, telegram_id: int,
+                                  session: AsyncSession) -> Optional[ConversionJob]:
+        """Задача пользователя, которая ещё выполняется или не доставлена."""
+        result = await session.execute(
+            select(ConversionJob)
+            .where(ConversionJob.telegram_id == telegram_id,
+                   ConversionJob.delivered_at.is_(None))
+            .order_by(ConversionJob.id)
+            .limit(1))
+        return result.scalar_one_or_none()
+
+    async def count_queued_before(self, job: ConversionJob,
+                                  session: AsyncSession) -> int:
+        """Сколько задач в очереди будет взято раньше этой."""
+        return await session.scalar(
+            select(func.count())
+            .where(ConversionJob.status == ConversionJob.QUEUED,
+                   or_(ConversionJob.priority > job.priority,
+                       and_(ConversionJob.priority == job.priority,
+                            ConversionJob.id < job.id)))) or 0
+
+    async def claim(
+            self,
+            worker_id: str,
+            visibility_timeout: float,
+            session: AsyncSession,
+    ) -> Optional[ConversionJob]:
+        """
+        Забрать следующую задачу (или None, если брать нечего)
+
+        Подходит задача в очереди, у которой наступил available_at, или
+        выполняющаяся, чей воркер не присылал heartbeat дольше
+        visibility_timeout. Сначала - с большим priority, затем старые.
+        """
+        now = datetime.now()
+        stale = now - timedelta(seconds=visibility_timeout)
+        result = await session.execute(
+            select(ConversionJob)
+            .where(or_(and_(ConversionJob.status == ConversionJob.QUEUED,
+                            ConversionJob.available_at <= now),
+                       and_(ConversionJob.status == ConversionJob.RUNNING,
+                            ConversionJob.heartbeat_at < stale)),
+                   ConversionJob.attempts < ConversionJob.max_attempts)
+            .order_by(ConversionJob.priority.desc(), ConversionJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True))
+        job = result.scalar_one_or_none()
+        if job is None:
+            await session.commit()
+            return None
+
+        # Условие на attempts и status - защита там, где SKIP LOCKED
+        # не поддерживается (SQLite): задачу успел забрать другой
+        claimed = await session.execute(
+            update(ConversionJob)
+            .where(ConversionJob.id == job.id,
+                   ConversionJob.status == job.status,
+                   ConversionJob.attempts == job.attempts)
+            .values(status=ConversionJob.RUNNING, worker_id=worker_id,
+                    attempts=job.attempts + 1, started_at=now,
+                    heartbeat_at=now)
+            .execution_options(synchronize_session='fetch'))
+        await session.commit()
+        if claimed.rowcount != 1:
+            return None
+        return job
+
+    async def heartbeat(self, job_id: int, worker_id: str,
+                        session: AsyncSession) -> bool:
+        """Продлить задачу. False - задачу уже забрал другой воркер."""
+        result = await session.execute(
+            update(ConversionJob)
+            .where(ConversionJob.id == job_id,
+                   ConversionJob.worker_id == worker_id,
+                   ConversionJob.status == ConversionJob.RUNNING)
+            .values(heartbeat_at=datetime.now()))
+        await session.commit()
+        return result.rowcount == 1
+
+    async def complete(
+            self,
+            job: ConversionJob,
+            worker_id: str,
+            result_path: str,
+            file_size: int,
+            session: AsyncSession,
+    ) -> bool:
+        """
+        Отметить задачу выполненной и записать статистику (Converting)
+
+        Обе записи - в одной транзакции. False - задачу уже забрал
+        другой воркер, результат не записан.
+        """
+        now = datetime.now()
+        result = await session.execute(
+            update(ConversionJob)
+            .where(ConversionJob.id == job.id,
+                   ConversionJob.worker_id == worker_id,
+                   ConversionJob.status == ConversionJob.RUNNING)
+            .values(status=ConversionJob.DONE, result_path=result_path,
+                    file_size=file_size, error=None, finished_at=now))
+        if result.rowcount != 1:
+            # Ничего не изменено; commit, а не rollback - объект job не устаревает
+            await session.commit()
+            return False
+
+        session.add(Converting(
+            telegram_id=job.telegram_id,
+            converted_at=now,
+            number_of_files=job.number_of_files,
+            file_size=file_size,
+            is_premium=job.is_premium,
+        ))
+        await session.commit()
+        return True
+
+    async def fail(
+            self,
+            job: ConversionJob,
+            worker_id: str,
+            error: str,
+            session: AsyncSession,
+            retry: bool = True,
+    ) -> Optional[str]:
+        """
+        Ошибка выполнения задачи
+
+        Если retry и попытки не исчерпаны, задача возвращается в очередь
+        с паузой RETRY_BACKOFF * 2^(attempts-1), иначе - failed.
+
+        Returns:
+            новый статус задачи или None, если её уже забрал другой воркер
+        """
+        now = datetime.now()
+        values: Dict[str, Any] = {'error': error[:1000], 'worker_id': None}
+        if retry and job.attempts < job.max_attempts:
+            values['status'] = ConversionJob.QUEUED
+            values['available_at'] = now + timedelta(
+                seconds=RETRY_BACKOFF * 2 ** max(job.attempts - 1, 0))
+        else:
+            values['status'] = ConversionJob.FAILED
+            values['finished_at'] = now
+
+        result = await session.execute(
+            update(ConversionJob)
+            .where(ConversionJob.id == job.id,
+                   ConversionJob.worker_id == worker_id,
+                   ConversionJob.status == ConversionJob.RUNNING)
+            .values(**values))
+        await session.commit()
+        return values['status'] if result.rowcount == 1 else None
+
+    async def fail_abandoned(self, visibility_timeout: float,
+                             session: AsyncSession) -> int:
+        """
+        Завершить ошибкой брошенные задачи, у которых не осталось попыток
+
+        Такие задачи claim() уже не выберет, а бот должен сообщить
+        пользователю об ошибке.
+        """
+        now = datetime.now()
+        result = await session.execute(
+            update(ConversionJob)
+            .where(ConversionJob.status == ConversionJob.RUNNING,
+                   ConversionJob.heartbeat_at < now - timedelta(seconds=visibility_timeout),
+                   ConversionJob.attempts >= ConversionJob.max_attempts)
+            .values(status=ConversionJob.FAILED, finished_at=now,
+                    error='Воркер перестал отвечать'))
+        await session.commit()
+        return result.rowcount
+
+    async def claim_for_delivery(self, session: AsyncSession,
+                                 limit: int = 10) -> List[ConversionJob]:
+        """
+        Забрать завершённые задачи для отправки пользователям
+
+        delivered_at отмечается сразу: при нескольких репликах бота
+        каждую задачу отправит только одна (SKIP LOCKED).
+        """
+        result = await session.execute(
+            select(ConversionJob)
+            .where(ConversionJob.status.in_([ConversionJob.DONE,
+                                             ConversionJob.FAILED]),
+                   ConversionJob.delivered_at.is_(None))
+            .order_by(ConversionJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True))
+        jobs = list(result.scalars().all())
+        now = datetime.now()
+        for job in jobs:
+            job.delivered_at = now
+        await session.commit()
+        return jobs
+
+    async def purge_delivered(self, before: datetime,
+                              session: AsyncSession) -> int:
+        """Удалить доставленные задачи старше before."""
+        result = await session.execute(
+            delete(ConversionJob)
+            .where(ConversionJob.delivered_at.is_not(None),
+                   ConversionJob.delivered_at < before))
+        await session.commit()
+        return result.rowcount
+
+
+crud_conversion_job = ConversionJobRepository()
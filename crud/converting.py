@@ -1,11 +1,114 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Date, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from crud.base import CRUDBase
 from database.models import Converting
 
 
 class ConvertingRepository(CRUDBase):
+    """
+    Статистика конвертаций
+
+    Агрегаты считаются в SQL (GROUP BY), ORM-объекты не загружаются.
+    Фильтры по пользователю и времени опираются на индексы
+    (telegram_id, converted_at) и (converted_at).
+    """
 
     def __init__(self):
         super().__init__(Converting)
 
+    @staticmethod
+    def _period(query, since: Optional[datetime], until: Optional[datetime]):
+        if since is not None:
+            query = query.where(Converting.converted_at >= since)
+        if until is not None:
+            query = query.where(Converting.converted_at < until)
+        return query
+
+    async def count_for_user(
+            self,
+            telegram_id: int,
+            session: AsyncSession,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> int:
+        """Число конвертаций пользователя за период (для квот)."""
+        query = self._period(
+            select(func.count()).where(Converting.telegram_id == telegram_id),
+            since, until)
+        return await session.scalar(query) or 0
+
+    async def counts_by_user(
+            self,
+            session: AsyncSession,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Число конвертаций и объём PDF по пользователям, самые активные первыми."""
+        conversions = func.count().label('conversions')
+        query = self._period(
+            select(
+                Converting.telegram_id,
+                conversions,
+                func.coalesce(func.sum(Converting.file_size), 0).label('total_bytes'),
+            ),
+            since, until,
+        ).group_by(Converting.telegram_id).order_by(conversions.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        result = await session.execute(query)
+        return [dict(row._mapping) for row in result]
+
+    async def bytes_per_day(
+            self,
+            session: AsyncSession,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """Число конвертаций и объём PDF по дням."""
+        day = func.date(Converting.converted_at, type_=Date).label('day')
+        query = self._period(
+            select(
+                day,
+                func.count().label('conversions'),
+                func.coalesce(func.sum(Converting.file_size), 0).label('total_bytes'),
+            ),
+            since, until,
+        ).group_by(day).order_by(day)
+        result = await session.execute(query)
+        return [dict(row._mapping) for row in result]
+
+    async def premium_breakdown(
+            self,
+            session: AsyncSession,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+    ) -> Dict[bool, Dict]:
+        """Конвертации премиум и обычных пользователей (NULL считается обычным)."""
+        is_premium = func.coalesce(Converting.is_premium, False).label('is_premium')
+        query = self._period(
+            select(
+                is_premium,
+                func.count().label('conversions'),
+                func.count(func.distinct(Converting.telegram_id)).label('users'),
+                func.coalesce(func.sum(Converting.number_of_files), 0).label('files'),
+                func.coalesce(func.sum(Converting.file_size), 0).label('total_bytes'),
+            ),
+            since, until,
+        ).group_by(is_premium)
+        result = await session.execute(query)
+        breakdown = {
+            flag: {'conversions': 0, 'users': 0, 'files': 0, 'total_bytes': 0}
+            for flag in (False, True)
+        }
+        for row in result:
+            values = dict(row._mapping)
+            breakdown[bool(values.pop('is_premium'))] = values
+        return breakdown
+
 
 crud_convert = ConvertingRepository()
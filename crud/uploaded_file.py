@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base import CRUDBase
+from crud.user import UPSERT_INSERTS
+from database.models import UploadedFile
+
+
+class UploadedFileRepository(CRUDBase):
+
+    def __init__(self):
+        super().__init__(UploadedFile)
+
+    async def get_by_hash(self, content_hash: str, session: AsyncSession) -> Optional[UploadedFile]:
+        """Найти загруженный файл по хэшу содержимого."""
+        result = await session.execute(
+            select(UploadedFile).where(UploadedFile.content_hash == content_hash))
+        return result.scalar_one_or_none()
+
+    async def save_file_id(
+            self,
+            content_hash: str,
+            file_id: str,
+            file_size: int,
+            session: AsyncSession,
+    ) -> UploadedFile:
+        """
+        Запомнить file_id для содержимого (или обновить устаревший).
+
+        INSERT ... ON CONFLICT (content_hash) DO UPDATE: два одинаковых
+        PDF, отправленных одновременно, не упираются в UNIQUE.
+        """
+        insert = UPSERT_INSERTS[session.bind.dialect.name]
+        data = {"file_id": file_id, "file_size": file_size, "uploaded_at": datetime.now()}
+        stmt = insert(UploadedFile).values(content_hash=content_hash, **data)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UploadedFile.content_hash],
+            set_={key: stmt.excluded[key] for key in data},
+        )
+        result = await session.execute(
+            stmt.returning(UploadedFile),
+            execution_options={"populate_existing": True})
+        uploaded = result.scalar_one()
+        await session.commit()
+        return uploaded
+
+
+crud_uploaded_file = UploadedFileRepository()
@@ -1,15 +1,55 @@
+import time
+from collections import OrderedDict
 from typing import Optional
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.core import USER_CACHE_SIZE, USER_CACHE_TTL
 from crud.base import CRUDBase
 from database.models import User
 
+# INSERT ... ON CONFLICT есть в обоих диалектах, но у каждого свой
+UPSERT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+class KnownUsersCache:
+    """TTL/LRU-кэш telegram_id пользователей, которые точно есть в БД."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._expires: OrderedDict = OrderedDict()
+
+    def __contains__(self, telegram_id: int) -> bool:
+        expires = self._expires.get(telegram_id)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._expires[telegram_id]
+            return False
+        self._expires.move_to_end(telegram_id)
+        return True
+
+    def add(self, telegram_id: int) -> None:
+        self._expires[telegram_id] = time.monotonic() + self.ttl
+        self._expires.move_to_end(telegram_id)
+        while len(self._expires) > self.max_size:
+            self._expires.popitem(last=False)
+
+    def discard(self, telegram_id: int) -> None:
+        self._expires.pop(telegram_id, None)
+
 
 class UserRepository(CRUDBase):
     def __init__(self):
         super().__init__(User)  # Передаем модель User и сессию
+        self.known_users = KnownUsersCache(USER_CACHE_SIZE, USER_CACHE_TTL)
 
     async def get_by_telegram_id(self, telegram_id: int, session: AsyncSession) -> Optional[User]:
         """Найти пользователя по telegram_id."""
@@ -18,13 +58,47 @@ class UserRepository(CRUDBase):
         return result.scalar_one_or_none()
 
     async def create_or_update(self, telegram_id: int, session: AsyncSession, **kwargs) -> User:
-        """Создать или обновить пользователя."""
-        user = await self.get_by_telegram_id(telegram_id=telegram_id, session=session)
-        if user:
-            await self.update(session, user.id, **kwargs)
+        """
+        Создать или обновить пользователя.
+
+        Один запрос INSERT ... ON CONFLICT (telegram_id) DO UPDATE вместо
+        SELECT + INSERT/UPDATE: на один round trip меньше и нет гонки
+        двух одновременных вставок одного telegram_id.
+        """
+        insert = UPSERT_INSERTS[session.bind.dialect.name]
+        stmt = insert(User).values(telegram_id=telegram_id, **kwargs)
+        if kwargs:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={key: stmt.excluded[key] for key in kwargs},
+            )
         else:
-            user = await self.create(session=session, data={"telegram_id": telegram_id, **kwargs})
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={"telegram_id": stmt.excluded.telegram_id},
+            )
+        result = await session.execute(
+            stmt.returning(User),
+            execution_options={"populate_existing": True})
+        user = result.scalar_one()
+        await session.commit()
+        self.known_users.add(telegram_id)
         return user
 
+    async def ensure_user(self, telegram_id: int, session: AsyncSession, **kwargs) -> bool:
+        """
+        Убедиться, что пользователь есть в БД.
+
+        Пользователи, недавно записанные этим процессом, берутся из кэша
+        без обращения к БД.
+
+        Returns:
+            bool: True - был запрос к БД, False - ответ из кэша
+        """
+        if telegram_id in self.known_users:
+            return False
+        await self.create_or_update(telegram_id, session, **kwargs)
+        return True
+
 
 crud_user = UserRepository()
@@ -1,14 +1,127 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import queue as sqla_queue
 
-from core.core import DATABASE_URL
+from core.core import (DATABASE_URL, DB_CONNECT_TIMEOUT, DB_MAX_OVERFLOW,
+                       DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE,
+                       DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE)
 from core.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который считает ожидания свободного соединения."""
+
+    waits = 0
+    wait_seconds = 0.0
+    timeouts = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        queue_get = self._pool.get
+
+        # QueuePool блокируется на очереди, только когда пул исчерпан
+        def timed_get(block=True, timeout=None):
+            if not block:
+                return queue_get(block, timeout)
+            start = time.perf_counter()
+            try:
+                return queue_get(block, timeout)
+            except sqla_queue.Empty:
+                InstrumentedQueuePool.timeouts += 1
+                raise
+            finally:
+                InstrumentedQueuePool.waits += 1
+                InstrumentedQueuePool.wait_seconds += time.perf_counter() - start
+
+        self._pool.get = timed_get
+
+
+def get_engine_kwargs(database_url: str) -> Dict[str, Any]:
+    """Настройки пула из окружения; для asyncpg - ещё и параметры драйвера."""
+    if not database_url.startswith("postgresql"):
+        # У SQLite свой пул, настройки QueuePool к нему не применимы
+        return {}
+
+    kwargs = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if database_url.startswith("postgresql+asyncpg"):
+        kwargs["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "timeout": DB_CONNECT_TIMEOUT,
+        }
+    return kwargs
+
+
 # Асинхронный движок
-engine = create_async_engine(DATABASE_URL, echo=False)  # echo=True для логов SQL
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,  # echo=True для логов SQL
+    **get_engine_kwargs(DATABASE_URL),
+)
+
+# Счётчики событий пула
+pool_events = {
+    "connects": 0,
+    "checkouts": 0,
+    "invalidations": 0,
+}
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_events["connects"] += 1
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_events["checkouts"] += 1
+
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_events["invalidations"] += 1
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Текущее состояние пула соединений и накопленные счётчики."""
+    pool = engine.pool
+    stats: Dict[str, Any] = dict(pool_events)
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            "waits": InstrumentedQueuePool.waits,
+            "wait_seconds": round(InstrumentedQueuePool.wait_seconds, 3),
+            "timeouts": InstrumentedQueuePool.timeouts,
+        })
+    return stats
+
+
+async def log_pool_stats(interval: float) -> None:
+    """Периодически пишет в лог состояние пула."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"Пул БД: {get_pool_stats()}")
+
 
 # Фабрика сессий
 AsyncSessionLocal = sessionmaker(
@@ -1,7 +1,76 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from core.core import DB_MIGRATIONS
+from core.logger import setup_logger
 from database.engine import engine
 from database.models import Base
 
+logger = setup_logger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / 'alembic.ini'
+
+
+def get_alembic_config() -> Config:
+    return Config(str(ALEMBIC_INI))
+
+
+def get_head_revision() -> str:
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+
+async def get_current_revision():
+    """Ревизия, записанная в alembic_version (None, если миграций не было)."""
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision())
+
 
 async def create_tables():
+    """Создать таблицы напрямую по моделям (для локальной разработки)."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def upgrade_database():
+    """Применить миграции до head на подключении бота."""
+    def run_upgrade(connection):
+        config = get_alembic_config()
+        config.attributes['connection'] = connection
+        command.upgrade(config, 'head')
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_upgrade)
+
+
+async def check_database():
+    """Только сверить ревизию БД с head, схему не трогаем."""
+    current = await get_current_revision()
+    head = get_head_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Схема БД не актуальна: ревизия {current}, нужна {head}. "
+            f"Выполните 'alembic upgrade head'")
+
+
+async def init_database(mode: str = DB_MIGRATIONS):
+    """
+    Подготовка схемы при старте
+
+    check - только проверка ревизии (миграции применяются отдельно),
+    upgrade - применить недостающие миграции,
+    create_all - старое поведение через Base.metadata.create_all.
+    """
+    if mode == 'check':
+        await check_database()
+    elif mode == 'upgrade':
+        await upgrade_database()
+    elif mode == 'create_all':
+        await create_tables()
+    else:
+        raise ValueError(f"Неизвестный режим DB_MIGRATIONS: {mode}")
+    logger.info(f"Схема БД готова (режим {mode})")
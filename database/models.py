@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String
+from sqlalchemy import (JSON, BigInteger, Boolean, Column, DateTime, Index,
+                        Integer, String, Text, text)
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -27,3 +28,77 @@ class Converting(Base):
     number_of_files = Column(Integer, nullable=True)
     file_size = Column(BigInteger, nullable=True)
     is_premium = Column(Boolean,)
+
+    __table_args__ = (
+        # Конвертации пользователя за период (квоты, история)
+        Index('ix_convertings_telegram_id_converted_at',
+              'telegram_id', 'converted_at'),
+        # Агрегаты по времени для всей таблицы
+        Index('ix_convertings_converted_at', 'converted_at'),
+    )
+
+
+class UploadedFile(Base):
+    """Уже загруженный в Telegram файл: повторно отправляется по file_id."""
+    __tablename__ = 'uploaded_files'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), unique=True)  # sha256 содержимого
+    file_id = Column(String(255))
+    file_size = Column(BigInteger, nullable=True)
+    uploaded_at = Column(DateTime, default=datetime.now)
+
+
+class ConversionJob(Base):
+    """
+    Задача конвертации для отдельных воркеров (CONVERSION_MODE=distributed)
+
+    queued -> running -> done | failed. Воркер забирает задачу через
+    SELECT ... FOR UPDATE SKIP LOCKED и продлевает heartbeat_at; задачу
+    с устаревшим heartbeat_at забирает другой воркер. Бот отправляет
+    результат и отмечает delivered_at.
+    """
+    __tablename__ = 'conversion_jobs'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger)
+    chat_id = Column(BigInteger)
+    message_id = Column(BigInteger)
+    is_premium = Column(Boolean, default=False)
+    status = Column(String(16), default=QUEUED)
+    priority = Column(Integer, default=0)
+    input_dir = Column(String(512))
+    output_dir = Column(String(512))
+    settings = Column(JSON, nullable=True)  # Параметры сжатия страниц
+    number_of_files = Column(Integer, nullable=True)
+    result_path = Column(String(512), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    error = Column(Text, nullable=True)
+    worker_id = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    available_at = Column(DateTime, default=datetime.now)  # Не раньше (повтор с паузой)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Выбор следующей задачи воркером
+        Index('ix_conversion_jobs_status_priority_id',
+              'status', 'priority', 'id'),
+        # Активная задача пользователя
+        Index('ix_conversion_jobs_telegram_id_status',
+              'telegram_id', 'status'),
+        # Не больше одной задачи в очереди или в работе на пользователя:
+        # две реплики бота не поставят задачу дважды
+        Index('uq_conversion_jobs_active_user', 'telegram_id', unique=True,
+              postgresql_where=text("status IN ('queued', 'running')"),
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
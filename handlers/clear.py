@@ -5,7 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.logger import setup_logger
 from crud.user import crud_user
-from utils.temp_buffer import delete_files_in_folder
+from utils.memory_staging import memory_staging
+from utils.temp_buffer import storage
 
 logger = setup_logger(__name__)
 
@@ -24,8 +25,9 @@ async def clear_handler(
 
     # Удаляем все временные файлы пользователя
     user_id = message.from_user.id
-    delete_files_in_folder(f'temp/{user_id}/input')
-    delete_files_in_folder(f'temp/{user_id}/output')
+    storage.clear_user(user_id)
+    if memory_staging is not None:
+        memory_staging.clear(user_id)
     logger.info(f"Пользователь {user_id} очистил временные файлы на диске")
 
     await message.answer(
@@ -4,16 +4,35 @@ from pathlib import Path
 from time import sleep
 
 from aiogram import Bot, F, Router, html
-from aiogram.exceptions import (TelegramAPIError, TelegramBadRequest,
-                                TelegramNetworkError, TelegramRetryAfter)
-from aiogram.types import FSInputFile, Message
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.constants import (CONVERT_MAX_HEIGHT, CONVERT_MAX_WIDTH,
+                            CONVERT_QUALITY)
+from core.core import (CONVERSION_MODE, CONVERTER_PAGE_WORKERS,
+                       CONVERTER_STREAMING_PDF, DOWNLOAD_WAIT_TIMEOUT,
+                       JOB_MAX_ATTEMPTS,
+                       SCHEDULER_POSITION_INTERVAL)
 from core.logger import setup_logger
-from crud.converting import crud_convert
+from crud.conversion_job import crud_conversion_job
 from crud.user import crud_user
-from utils.image_converter import image_converter_to_pdf
-from utils.temp_buffer import create_temp_folder, delete_files_in_folder
+from database.models import ConversionJob
+from utils.converter_executor import ConversionTimeout, conversion_executor
+from utils.delivery import deliver_pdf, job_delivery
+from utils.eager_compression import eager_compressor
+from utils.image_converter import ALLOWED_EXTENSIONS, image_converter_to_pdf
+from utils.job_manifest import (collect_inputs, find_reusable_pdf,
+                                save_manifest)
+from utils.job_scheduler import JobTicket, QueueFull, job_scheduler
+from utils.memory_staging import memory_staging
+from utils.metrics import (ASSEMBLY_SECONDS, DB_SECONDS, DOWNLOAD_BYTES,
+                           DOWNLOAD_SECONDS, DOWNLOAD_WAIT_SECONDS,
+                           JOB_SECONDS, JOBS, PDF_BYTES, QUEUE_WAIT_SECONDS)
+from utils.pending_downloads import pending_downloads
+from utils.stats_recorder import stats_recorder
+from utils.temp_buffer import (StorageQuotaExceeded, create_temp_folder,
+                               delete_files_in_folder, storage)
 
 logger = setup_logger(name=__name__)
 
@@ -27,12 +46,20 @@ async def media_handler(message: Message, bot: Bot) -> None:
     user_id = message.from_user.id
     logger.info(f"Получен файл от пользователя {user_id}")
 
+    # Регистрируем загрузку до первого await, чтобы /convert её дождался
+    download = pending_downloads.begin(user_id)
+
     path_in, path_out = create_temp_folder(user_id)
     logger.debug(f"Созданы временные папки: {path_in}, {path_out}")
 
-    msg = await message.answer('Увидел файлы, сохраняю...')
-
+    # Нужны в finally, даже если ответить пользователю не удалось
+    document_name = None
+    msg = None
+    # Место под файл, занятое в квоте до конца записи на диск
+    reserved = 0
     try:
+        msg = await message.answer('Увидел файлы, сохраняю...')
+
         if message.document is not None:
             document = message.document
             document_name = message.document.file_name
@@ -45,118 +72,250 @@ async def media_handler(message: Message, bot: Bot) -> None:
         filename = '_'.join([str(message.message_id), document_name])
         filepath = f'{path_in}/{filename}'
 
-        logger.debug(f"Скачивание файла в {filepath}")
-        await bot.download(document.file_id, destination=filepath)
+        # Файлы, оставшиеся в памяти, место на диске не занимают
+        if memory_staging is None or not memory_staging.accepts(document.file_size):
+            reserved = await asyncio.to_thread(
+                storage.reserve, user_id, document.file_size)
+
+        source = filepath
+        if memory_staging is not None and memory_staging.accepts(document.file_size):
+            # Скачиваем в память, на диск - только если её не хватает
+            with DOWNLOAD_SECONDS.time(target='memory'):
+                buffer = await bot.download(document.file_id)
+            data = buffer.getvalue()
+            if memory_staging.put(user_id, filename, data):
+                source = data
+                logger.debug(f"Файл {filename} сохранён в памяти")
+            else:
+                reserved = await asyncio.to_thread(storage.reserve, user_id, len(data))
+                await asyncio.to_thread(Path(filepath).write_bytes, data)
+                logger.debug(f"Файл {filename} сброшен на диск: {filepath}")
+        else:
+            logger.debug(f"Скачивание файла в {filepath}")
+            with DOWNLOAD_SECONDS.time(target='disk'):
+                await bot.download(document.file_id, destination=filepath)
         logger.info(f"✅ Файл сохранён: {html.code(document_name)}")
+        DOWNLOAD_BYTES.inc(document.file_size or 0)
+        # Файл уже на диске и учитывается в квоте сам
+        storage.release(user_id, reserved)
+        reserved = 0
+        pending_downloads.finish(download)
+
+        # Сжимаем сразу, пока пользователь досылает остальные файлы.
+        # Результат попадёт в кэш страниц; /convert его не ждёт
+        if (eager_compressor is not None
+                and filename.lower().endswith(ALLOWED_EXTENSIONS)):
+            eager_compressor.submit(user_id, source, filename)
 
         await msg.edit_text('Файл сохранён')
         await asyncio.sleep(1)
         await msg.delete()
 
+    except StorageQuotaExceeded as e:
+        logger.warning(f"Превышен лимит временных файлов: {e}")
+        await message.answer('❌ Слишком много файлов. Отправьте /convert '
+                             'или очистите загруженное командой /clear')
     except Exception as e:
         logger.error(f"❌ Ошибка при сохранении файла: {e}", exc_info=True)
     finally:
-        logger.info(f"Файл {html.code(document_name)} готов к конвертации")
+        storage.release(user_id, reserved)
+        pending_downloads.finish(download)
+        if document_name is not None:
+            logger.info(f"Файл {html.code(document_name)} готов к конвертации")
+
 
+@router.message(F.text.contains('convert'))
+async def pdf_converter_handler(message: Message, session: AsyncSession) -> None:
+    """Обработчик конвертации PDF"""
+
+    user_id = message.from_user.id
+    logger.info(f" === НАЧАЛО КОНВЕРТАЦИИ для пользователя {user_id} ===")
+    start_time = asyncio.get_event_loop().time()
+
+    msg = await message.answer('Начинаю конвертацию ваших файлов... ⏳')
 
-async def send_file_with_retry(
-    message: Message,
-    file_path: str,
-    caption: str = None,
-    max_retries: int = 3
-) -> bool:
-    """Отправка файла с повторными попытками и логированием"""
+    # Ждём ровно те загрузки, что ещё идут
+    pending_count = pending_downloads.count(user_id)
+    logger.debug(f"Незавершённых загрузок перед конвертацией: {pending_count}")
+    with DOWNLOAD_WAIT_SECONDS.time():
+        downloaded = await pending_downloads.wait(user_id, timeout=DOWNLOAD_WAIT_TIMEOUT)
+    if not downloaded:
+        await msg.edit_text('⏳ Часть файлов ещё загружается. '
+                            'Отправьте /convert ещё раз чуть позже')
+        record_job('downloads_pending', start_time)
+        return
 
-    logger.info(f"Начало отправки файла {file_path}")
-    logger.debug(f"Параметры: max_retries={max_retries}, caption={caption}")
+    # Ещё не сжатые заранее страницы сожмёт сама конвертация
+    if eager_compressor is not None and eager_compressor.cancel(user_id):
+        logger.debug(f"Отменено заранее сжатие страниц пользователя {user_id}")
+
+    # Проверяем, есть ли пользователь в БД (известные берутся из кэша)
+    logger.debug(f"Проверка пользователя {user_id} в БД")
+    user_dict = {
+            "first_name": message.from_user.first_name,
+            "last_name": message.from_user.last_name,
+            "username": message.from_user.username,
+            "is_premium": message.from_user.is_premium
+        }
+    with DB_SECONDS.time(operation='ensure_user'):
+        created = await crud_user.ensure_user(user_id, session, **user_dict)
+    if created:
+        logger.debug(f"Пользователь {user_id} записан в БД")
+    else:
+        logger.debug(f"Пользователь {user_id} найден в кэше")
 
-    for attempt in range(1, max_retries + 1):
+    if CONVERSION_MODE == 'distributed':
+        # Конвертируют отдельные воркеры, PDF отправит job_delivery
         try:
-            logger.debug(f"Попытка {attempt}/{max_retries} отправки файла")
-
-            file_to_send = FSInputFile(file_path)
-            await message.answer_document(
-                document=file_to_send,
-                caption=caption,
-                reply_markup=None
-            )
-
-            file_size = os.path.getsize(file_path) / 1024  # в KB
-            logger.info(f"Файл успешно отправлен! Размер: {file_size:.2f} KB, попытка: {attempt}")
-            return True
-
-        except TelegramRetryAfter as e:
-            wait_time = e.retry_after
-            logger.warning(f"Flood control от Telegram. Ждём {wait_time} сек (попытка {attempt}/{max_retries})")
-            await asyncio.sleep(wait_time)
-
-        except TelegramNetworkError as e:
-            logger.warning(f"Сетевая ошибка: {e}. Попытка {attempt}/{max_retries}")
-            if attempt < max_retries:
-                wait_time = 2 ** attempt  # 2, 4, 8 секунд
-                logger.debug(f"Повтор через {wait_time} сек")
-                await asyncio.sleep(wait_time)
-            else:
-                logger.error(f"Исчерпаны все попытки отправки из-за сетевой ошибки")
+            result = await submit_job(message, session, msg)
+        finally:
+            await session.close()
+        record_job(result, start_time)
+        return
 
-        except TelegramBadRequest as e:
-            logger.error(f"Bad request ошибка: {e}", exc_info=True)
-            # Такую ошибку повторять бесполезно
-            break
+    # Не держим соединение из пула, пока задача ждёт в очереди
+    await session.close()
 
-        except TelegramAPIError as e:
-            logger.error(f"Ошибка Telegram API: {e}", exc_info=True)
-            if attempt < max_retries:
-                await asyncio.sleep(3)
-            else:
-                logger.error(f"Исчерпаны все попытки отправки")
+    # Одна активная конвертация на пользователя, очередь общая и справедливая
+    try:
+        ticket = job_scheduler.enqueue(user_id, premium=bool(message.from_user.is_premium))
+    except QueueFull as e:
+        logger.warning(f"Очередь переполнена, отказ пользователю {user_id}: {e}")
+        await msg.edit_text('⏳ Сейчас слишком много конвертаций. Попробуйте через пару минут')
+        record_job('queue_full', start_time)
+        return
 
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка при отправке: {e}", exc_info=True)
-            if attempt < max_retries:
-                await asyncio.sleep(3)
-            else:
-                logger.error(f"Исчерпаны все попытки отправки")
+    if ticket.coalesced:
+        position = job_scheduler.position(ticket)
+        logger.info(f"Конвертация {user_id} уже в очереди (позиция {position})")
+        await msg.edit_text(f'⏳ Ваша конвертация уже в очереди, позиция: {position}')
+        record_job('coalesced', start_time)
+        return
 
-    return False
+    result = 'error'
+    try:
+        with QUEUE_WAIT_SECONDS.time():
+            await wait_for_turn(ticket, msg)
+        result = await convert_and_send(message, session, msg, start_time)
+    finally:
+        job_scheduler.release(ticket)
+        record_job(result, start_time)
+
+
+async def report_active_job(user_id: int, session: AsyncSession, msg: Message) -> bool:
+    """Сообщить о недоставленной задаче пользователя, если она есть."""
+    with DB_SECONDS.time(operation='job_lookup'):
+        active = await crud_conversion_job.get_active_for_user(user_id, session)
+    if active is None:
+        return False
+    if active.status == ConversionJob.QUEUED:
+        position = await crud_conversion_job.count_queued_before(active, session) + 1
+        await msg.edit_text(f'⏳ Ваша конвертация уже в очереди, позиция: {position}')
+    else:
+        await msg.edit_text('⏳ Ваша конвертация уже выполняется')
+    logger.info(f"Задача {active.id} пользователя {user_id} ещё не доставлена")
+    return True
 
 
-@router.message(F.text.contains('convert'))
-async def pdf_converter_handler(message: Message, session: AsyncSession) -> None:
-    """Обработчик конвертации PDF"""
+async def submit_job(message: Message, session: AsyncSession, msg: Message) -> str:
+    """
+    Поставить конвертацию в очередь воркеров (CONVERSION_MODE=distributed)
 
+    Файлы из памяти сбрасываются на диск: воркеры видят только общий
+    TEMP_ROOT. Премиум-задачи воркеры берут первыми.
+
+    Возвращает итог для метрик: queued, coalesced, no_files или quota_exceeded.
+    """
     user_id = message.from_user.id
-    logger.info(f" === НАЧАЛО КОНВЕРТАЦИИ для пользователя {user_id} ===")
-    start_time = asyncio.get_event_loop().time()
 
-    msg = await message.answer('Начинаю конвертацию ваших файлов... ⏳')
+    if await report_active_job(user_id, session, msg):
+        return 'coalesced'
 
-    # Даём время на загрузку последних файлов
-    logger.debug("Ожидание 5 секунды перед началом конвертации...")
-    await asyncio.sleep(5)
-
-    # Проверяем, есть ли пользователь в БД
-    logger.debug(f"Поиск пользователя {user_id} в БД")
-    user = await crud_user.get_by_telegram_id(
-        telegram_id=user_id,
-        session=session)
-
-    if not user:
-        logger.info(f"Новый пользователь {user_id}. Добавление в БД")
-        user_dict = {
-                "first_name": message.from_user.first_name,
-                "last_name": message.from_user.last_name,
-                "username": message.from_user.username,
-                "is_premium": message.from_user.is_premium
-            }
-        await crud_user.create_or_update(
-            user_id,
-            session,
-            **user_dict)
-        logger.debug(f"Пользователь {user_id} успешно добавлен")
-    else:
-        logger.debug(f"Пользователь {user_id} найден в БД")
+    path_in, path_out = create_temp_folder(user_id)
+    if memory_staging is not None and memory_staging.count(user_id):
+        # Сброшенные на диск файлы занимают место в квоте пользователя
+        try:
+            reserved = await asyncio.to_thread(
+                storage.reserve, user_id, memory_staging.usage(user_id))
+        except StorageQuotaExceeded as e:
+            logger.warning(f"Превышен лимит временных файлов: {e}")
+            await msg.edit_text('❌ Слишком много файлов. Очистите загруженное '
+                                'командой /clear и отправьте файлы заново')
+            return 'quota_exceeded'
+        try:
+            await asyncio.to_thread(memory_staging.spill, user_id, path_in)
+        finally:
+            storage.release(user_id, reserved)
+    file_count = len(os.listdir(path_in))
+    logger.info(f"Найдено файлов для конвертации: {file_count}")
+    if file_count == 0:
+        logger.warning(f"Нет файлов для конвертации у пользователя {user_id}")
+        await msg.edit_text('❌ Нет загруженных файлов для конвертации')
+        return 'no_files'
 
+    premium = bool(message.from_user.is_premium)
+    with DB_SECONDS.time(operation='job_enqueue'):
+        job = await crud_conversion_job.enqueue(
+            session,
+            telegram_id=user_id,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            input_dir=os.path.abspath(path_in),
+            output_dir=os.path.abspath(path_out),
+            number_of_files=file_count,
+            settings={
+                "quality": CONVERT_QUALITY,
+                "max_width": CONVERT_MAX_WIDTH,
+                "max_height": CONVERT_MAX_HEIGHT,
+            },
+            is_premium=premium,
+            priority=1 if premium else 0,
+            max_attempts=JOB_MAX_ATTEMPTS,
+        )
+        if job is None:
+            # Между проверкой и вставкой задачу поставила другая реплика
+            await report_active_job(user_id, session, msg)
+            return 'coalesced'
+        position = await crud_conversion_job.count_queued_before(job, session) + 1
+    job_delivery.track(user_id)
+    logger.info(f"Задача {job.id} пользователя {user_id} поставлена в очередь воркеров")
+    await msg.edit_text(f'⏳ Файлов: {file_count}. Вы в очереди на конвертацию, '
+                        f'позиция: {position}. PDF придёт, когда будет готов')
+    return 'queued'
+
+
+def record_job(result: str, start_time: float) -> None:
+    """Учесть завершённую команду /convert в метриках."""
+    JOBS.inc(result=result)
+    JOB_SECONDS.observe(asyncio.get_event_loop().time() - start_time, result=result)
+
+
+async def wait_for_turn(ticket: JobTicket, msg: Message) -> None:
+    """Дождаться запуска задачи, показывая пользователю место в очереди."""
+    shown = None
+    position = job_scheduler.position(ticket)
+    while position:
+        if position != shown:
+            try:
+                await msg.edit_text(f'⏳ Вы в очереди на конвертацию, позиция: {position}')
+                shown = position
+            except TelegramAPIError as e:
+                logger.warning(f"Не удалось обновить позицию в очереди: {e}")
+        await ticket.wait(timeout=SCHEDULER_POSITION_INTERVAL)
+        position = job_scheduler.position(ticket)
+    if shown is not None:
+        logger.info(f"Очередь дошла до пользователя {ticket.user_id}")
+
+
+async def convert_and_send(message: Message, session: AsyncSession,
+                           msg: Message, start_time: float) -> str:
+    """
+    Конвертация файлов пользователя и отправка PDF (выполняется по очереди)
+
+    Возвращает итог для метрик: success, send_failed, no_files,
+    timeout, error или no_output.
+    """
+    user_id = message.from_user.id
     path_in, path_out = create_temp_folder(user_id)
     logger.info(f"Временные папки:\n  Вход: {path_in}\n  Выход: {path_out}")
 
@@ -165,16 +324,17 @@ async def pdf_converter_handler(message: Message, session: AsyncSession) -> None
         "is_premium": message.from_user.is_premium,
     }
 
-    # Проверяем наличие файлов для конвертации
+    # Проверяем наличие файлов для конвертации: на диске и в памяти
+    staged = memory_staging.items(user_id) if memory_staging is not None else {}
     files_in_folder = os.listdir(path_in)
-    file_count = len(files_in_folder)
+    file_count = len(files_in_folder) + len(staged)
     logger.info(f"Найдено файлов для конвертации: {file_count}")
     await message.answer(f'Найдено файлов для конвертации: {file_count} 📁')
 
     if file_count == 0:
         logger.warning(f"Нет файлов для конвертации у пользователя {user_id}")
         await msg.edit_text('❌ Нет загруженных файлов для конвертации')
-        return
+        return 'no_files'
 
     # Конвертируем файлы
     try:
@@ -182,17 +342,42 @@ async def pdf_converter_handler(message: Message, session: AsyncSession) -> None
         logger.info(f"Начало конвертации {file_count} файлов...")
         msg = await message.answer(f'Начало конвертации {file_count} файлов... ⏳')
 
-        result_filename = image_converter_to_pdf(
-            path_in,
-            path_out,
-            message.message_id,
-            quality=75,        # 75% - хороший баланс
-            max_width=1200,    # Ограничиваем ширину
-            max_height=1800    # Ограничиваем высоту
-        )
+        conversion_settings = {
+            "quality": CONVERT_QUALITY,
+            "max_width": CONVERT_MAX_WIDTH,
+            "max_height": CONVERT_MAX_HEIGHT,
+        }
+        inputs = collect_inputs(path_in, staged)
+
+        # Повтор после неудачной отправки: входные файлы не менялись,
+        # значит готовый PDF можно отправить без новой конвертации
+        result_filename = find_reusable_pdf(path_in, inputs, conversion_settings)
 
-        logger.info(f"✅ Конвертация завершена. Результирующий файл: {result_filename}")
-        await msg.edit_text(f'✅ Конвертация завершена. Результат готов к отправке! 📤')
+        if result_filename:
+            logger.info(f"♻️ Входные файлы не изменились, используем {result_filename}")
+            await msg.edit_text('♻️ Файлы не изменились, отправляю готовый PDF 📤')
+        else:
+            # Старые результаты больше не актуальны
+            delete_files_in_folder(path_out)
+
+            # Конвертация идёт в пуле воркеров и не блокирует event loop
+            with ASSEMBLY_SECONDS.time():
+                result_filename = await conversion_executor.run(
+                    image_converter_to_pdf,
+                    path_in,
+                    path_out,
+                    message.message_id,
+                    workers=CONVERTER_PAGE_WORKERS,
+                    streaming=CONVERTER_STREAMING_PDF,
+                    staged=staged,
+                    **conversion_settings
+                )
+
+            logger.info(f"✅ Конвертация завершена. Результирующий файл: {result_filename}")
+            await msg.edit_text(f'✅ Конвертация завершена. Результат готов к отправке! 📤')
+
+            if result_filename:
+                save_manifest(path_in, inputs, result_filename, conversion_settings)
 
         # Проверяем размер результата
         if os.path.exists(result_filename):
@@ -200,13 +385,18 @@ async def pdf_converter_handler(message: Message, session: AsyncSession) -> None
             file_size_mb = file_size_kb / 1024
             logger.info(f"Размер PDF: {file_size_kb:.2f} KB ({file_size_mb:.2f} MB)")
             data["file_size"] = os.path.getsize(result_filename)
+            PDF_BYTES.inc(data["file_size"])
         else:
             logger.error(f"Файл {result_filename} не создан!")
 
+    except ConversionTimeout as e:
+        logger.error(f"Таймаут конвертации для пользователя {user_id}: {e}")
+        await message.answer('❌ Конвертация заняла слишком много времени, попробуйте меньше файлов')
+        return 'timeout'
     except Exception as e:
         logger.error(f"Ошибка при конвертации: {e}", exc_info=True)
         await message.answer('❌ Ошибка при конвертации файлов')
-        return
+        return 'error'
 
     # Проверяем наличие выходного файла
     files_in_out = os.listdir(path_out)
@@ -215,63 +405,20 @@ async def pdf_converter_handler(message: Message, session: AsyncSession) -> None
     if len(files_in_out) == 0:
         logger.error(f"❌ Не найден исходящий файл в {path_out}")
         await message.answer('❌ Не найден исходящий файл для отправки')
-        return
+        return 'no_output'
+
+    # Статистика пишется в БД пакетами в фоне
+    logger.debug(f"Статистика конвертации поставлена в очередь")
+    stats_recorder.record(data)
 
     # Отправляем результат с повторными попытками
-    logger.info(f"📤 Начало отправки результата пользователю {user_id}")
-    
-    caption = f"✅ Конвертировано файлов: {file_count}"
-    success = await send_file_with_retry(
-        message,
-        result_filename,
-        caption=caption
-    )
-    
-    # Записываем статистику в БД
-    logger.debug(f"Сохранение данных конвертации в БД")
-    await crud_convert.create(
-        session=session,
-        data=data
-    )
-    
-    # ✅ КРИТИЧЕСКОЕ ИЗМЕНЕНИЕ: Удаляем файлы ТОЛЬКО при успешной отправке
-    if success:
-        logger.info(f"Отправка успешна, очищаем временные файлы...")
-        try:
-            await asyncio.sleep(2)
-            delete_files_in_folder(path_in)
-            delete_files_in_folder(path_out)
-            logger.debug(f"Файлы удалены из {path_in} и {path_out}")
-            
-            # Удаляем папки
-            common_path = Path(path_in).parent
-            Path(path_in).rmdir()
-            Path(path_out).rmdir()
-            Path(common_path).rmdir()
-            logger.debug(f"Временные папки удалены")
-        except Exception as e:
-            logger.error(f"❌ Ошибка при удалении временных файлов: {e}")
-    else:
-        logger.warning(f"⚠️ Файлы НЕ УДАЛЕНЫ - отправка не удалась. "
-                       f"Пользователь {user_id} может повторить попытку позже")
-        
-        # Отправляем сообщение пользователю
-        try:
-            await message.answer(
-                "❌ *Ошибка отправки*\n"
-                "Не удалось отправить файл из-за проблем с сетью.\n"
-                "*Ваши файлы сохранены!*\n\n"
-                "Просто отправьте команду /convert ещё раз, "
-                "когда соединение восстановится.\n"
-                "Повторно загружать изображения **не нужно**.",
-                parse_mode='html'
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить сообщение об ошибке: {e}")
+    success = await deliver_pdf(message.bot, message.chat.id, user_id, session,
+                                result_filename, file_count, data.get("file_size"))
 
     # Финальный лог
     elapsed_time = asyncio.get_event_loop().time() - start_time
     if success:
         logger.info(f"✨ === КОНВЕРТАЦИЯ УСПЕШНО ЗАВЕРШЕНА для {user_id} за {elapsed_time:.2f}с ===")
     else:
-        logger.error(f"💥 === КОНВЕРТАЦИЯ ЗАВЕРШИЛАСЬ ОШИБКОЙ для {user_id} за {elapsed_time:.2f}с ===")
\ No newline at end of file
+        logger.error(f"💥 === КОНВЕРТАЦИЯ ЗАВЕРШИЛАСЬ ОШИБКОЙ для {user_id} за {elapsed_time:.2f}с ===")
+    return 'success' if success else 'send_failed'
@@ -18,22 +18,17 @@ async def command_start_handler(
     This handler receives messages with `/start` command
     """
 
-    # Проверяем, есть ли пользователь в БД
-    user = await crud_user.get_by_telegram_id(
-        telegram_id=message.from_user.id,
-        session=session)
-
-    if not user:
-        user_dict = {
-                "first_name": message.from_user.first_name,
-                "last_name": message.from_user.last_name,
-                "username": message.from_user.username,
-                "is_premium": message.from_user.is_premium
-            }
-        await crud_user.create_or_update(
-            message.from_user.id,
-            session,
-            **user_dict,)
+    # Добавляем пользователя в БД, если его там ещё нет
+    user_dict = {
+            "first_name": message.from_user.first_name,
+            "last_name": message.from_user.last_name,
+            "username": message.from_user.username,
+            "is_premium": message.from_user.is_premium
+        }
+    await crud_user.ensure_user(
+        message.from_user.id,
+        session,
+        **user_dict,)
 
     create_temp_folder(message.from_user.id)
 
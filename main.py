@@ -3,26 +3,60 @@ import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiohttp import ClientTimeout, TCPConnector
 
-from core.core import TOKEN
+from core.core import (BOT_MODE, CONVERSION_MODE, DB_POOL_STATS_INTERVAL,
+                       TELEGRAM_API_URL, TOKEN)
 from core.logger import setup_logger
-from database.init_db import create_tables
+from database.engine import engine, log_pool_stats
+from database.init_db import init_database
 from handlers.pdf_working import router as pdf_router
 from handlers.repeater import router as repeater_router
 from handlers.start import router as start_router
 from handlers.clear import router as clear_router
 from middlewares.db import DbSessionMiddleware
 from utils.commands import set_common_commands
+from utils.converter_executor import conversion_executor
+from utils.delivery import job_delivery
+from utils.eager_compression import eager_compressor
+from utils.janitor import janitor
+from utils.metrics import metrics_server
+from utils.stats_recorder import stats_recorder
+from utils.webhook import WebhookServer
 
 # Инициализация логгера
 logger = setup_logger(__name__)
 
+background_tasks = set()
+
 
 async def on_startup(bot: Bot):
     await set_common_commands(bot)
     logger.info("Команды настроены")
+    janitor.start()
+    stats_recorder.start()
+    await metrics_server.start()
+    if CONVERSION_MODE == "distributed":
+        job_delivery.start(bot)
+    if DB_POOL_STATS_INTERVAL > 0:
+        background_tasks.add(
+            asyncio.create_task(log_pool_stats(DB_POOL_STATS_INTERVAL)))
+
+
+async def on_shutdown(bot: Bot):
+    for task in background_tasks:
+        task.cancel()
+    await janitor.stop()
+    await job_delivery.stop()
+    # Ожидание пула блокирует, не держим на нём event loop
+    await asyncio.to_thread(conversion_executor.shutdown, True)
+    if eager_compressor is not None:
+        eager_compressor.shutdown(wait=False)
+    await stats_recorder.stop()
+    await metrics_server.stop()
+    await engine.dispose()
 
 
 async def main() -> None:
@@ -36,8 +70,16 @@ async def main() -> None:
         sock_connect=15   # Таймаут на сокет-соединение
     )
 
+    # Свой Bot API сервер (локальный или тестовая заглушка)
+    session = AiohttpSession(
+        api=(TelegramAPIServer.from_base(TELEGRAM_API_URL)
+             if TELEGRAM_API_URL else PRODUCTION),
+        timeout=timeout.total
+    )
+
     bot = Bot(
         token=TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
         timeout=timeout.total,  # Важно! Передаём только число, а не объект
         connect_timeout=15,
@@ -47,6 +89,7 @@ async def main() -> None:
     dp.update.outer_middleware(DbSessionMiddleware())
 
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
 
     # Подключаем все роутеры
     dp.include_router(start_router)
@@ -55,10 +98,13 @@ async def main() -> None:
     dp.include_router(repeater_router)
     logger.info("Роутеры загружены")
 
-    await create_tables()
+    await init_database()
 
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await WebhookServer(dp, bot).run()
+        else:
+            await dp.start_polling(bot)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
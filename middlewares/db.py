@@ -1,8 +1,38 @@
 from aiogram import BaseMiddleware, types
-from typing import Callable, Awaitable, Any, Dict
+from typing import Callable, Awaitable, Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.engine import AsyncSessionLocal
 
 
+class LazySession:
+    """
+    Прокси AsyncSession, который создаёт сессию при первом обращении
+
+    Обработчики без запросов к БД (загрузка фото, эхо) не создают
+    сессию вовсе, а соединение из пула берётся только на первом запросе.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def is_opened(self) -> bool:
+        """Была ли сессия создана."""
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        """Закрыть сессию (если создавалась) и вернуть соединение в пул."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
 class DbSessionMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -10,6 +40,9 @@ class DbSessionMiddleware(BaseMiddleware):
         event: types.Message,
         data: Dict[str, Any],
     ) -> Any:
-        async with AsyncSessionLocal() as session:
-            data["session"] = session  # Добавляем сессию в data
+        session = LazySession(AsyncSessionLocal)
+        data["session"] = session  # Сессия создастся только при первом запросе
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
@@ -0,0 +1,54 @@
+"""initial schema: users, convertings
+
+Схема, которую раньше создавал create_all. Таблицы создаются, только
+если их ещё нет, поэтому существующая база подхватывается без stamp.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # В режиме --sql подключения нет - генерируем SQL для пустой базы
+    if context.is_offline_mode():
+        existing = []
+    else:
+        existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('telegram_id', sa.BigInteger(), unique=True),
+            sa.Column('first_name', sa.String(50), nullable=True),
+            sa.Column('last_name', sa.String(50), nullable=True),
+            sa.Column('username', sa.String(100), nullable=True),
+            sa.Column('is_premium', sa.Boolean()),
+            sa.Column('registration_date', sa.DateTime()),
+        )
+
+    if 'convertings' not in existing:
+        op.create_table(
+            'convertings',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('telegram_id', sa.BigInteger()),
+            sa.Column('converted_at', sa.DateTime()),
+            sa.Column('number_of_files', sa.Integer(), nullable=True),
+            sa.Column('file_size', sa.BigInteger(), nullable=True),
+            sa.Column('is_premium', sa.Boolean()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('convertings')
+    op.drop_table('users')
@@ -0,0 +1,50 @@
+"""uploaded_files, indexes on convertings
+
+uploaded_files могла быть уже создана через create_all, индексы - нет.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        tables, indexes = [], set()
+    else:
+        inspector = sa.inspect(op.get_bind())
+        tables = inspector.get_table_names()
+        indexes = {index['name'] for index in inspector.get_indexes('convertings')}
+
+    if 'uploaded_files' not in tables:
+        op.create_table(
+            'uploaded_files',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('content_hash', sa.String(64), unique=True),
+            sa.Column('file_id', sa.String(255)),
+            sa.Column('file_size', sa.BigInteger(), nullable=True),
+            sa.Column('uploaded_at', sa.DateTime()),
+        )
+
+    if 'ix_convertings_telegram_id_converted_at' not in indexes:
+        op.create_index('ix_convertings_telegram_id_converted_at',
+                        'convertings', ['telegram_id', 'converted_at'])
+    if 'ix_convertings_converted_at' not in indexes:
+        op.create_index('ix_convertings_converted_at',
+                        'convertings', ['converted_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_convertings_converted_at', table_name='convertings')
+    op.drop_index('ix_convertings_telegram_id_converted_at',
+                  table_name='convertings')
+    op.drop_table('uploaded_files')
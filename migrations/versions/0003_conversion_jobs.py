@@ -0,0 +1,83 @@
+"""conversion_jobs
+
+Очередь задач для отдельных воркеров конвертации (worker.py).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Не больше одной задачи в очереди или в работе на пользователя
+ACTIVE_WHERE = sa.text("status IN ('queued', 'running')")
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        tables, indexes = [], set()
+    else:
+        inspector = sa.inspect(op.get_bind())
+        tables = inspector.get_table_names()
+        indexes = set()
+        if 'conversion_jobs' in tables:
+            indexes = {index['name'] for index in inspector.get_indexes('conversion_jobs')}
+
+    # Таблица могла быть уже создана через create_all
+    if 'conversion_jobs' not in tables:
+        op.create_table(
+            'conversion_jobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('telegram_id', sa.BigInteger()),
+            sa.Column('chat_id', sa.BigInteger()),
+            sa.Column('message_id', sa.BigInteger()),
+            sa.Column('is_premium', sa.Boolean()),
+            sa.Column('status', sa.String(16)),
+            sa.Column('priority', sa.Integer()),
+            sa.Column('input_dir', sa.String(512)),
+            sa.Column('output_dir', sa.String(512)),
+            sa.Column('settings', sa.JSON(), nullable=True),
+            sa.Column('number_of_files', sa.Integer(), nullable=True),
+            sa.Column('result_path', sa.String(512), nullable=True),
+            sa.Column('file_size', sa.BigInteger(), nullable=True),
+            sa.Column('attempts', sa.Integer()),
+            sa.Column('max_attempts', sa.Integer()),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('worker_id', sa.String(128), nullable=True),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('available_at', sa.DateTime()),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.Column('delivered_at', sa.DateTime(), nullable=True),
+        )
+
+    if 'ix_conversion_jobs_status_priority_id' not in indexes:
+        op.create_index('ix_conversion_jobs_status_priority_id',
+                        'conversion_jobs', ['status', 'priority', 'id'])
+    if 'ix_conversion_jobs_telegram_id_status' not in indexes:
+        op.create_index('ix_conversion_jobs_telegram_id_status',
+                        'conversion_jobs', ['telegram_id', 'status'])
+    if 'uq_conversion_jobs_active_user' not in indexes:
+        op.create_index('uq_conversion_jobs_active_user',
+                        'conversion_jobs', ['telegram_id'], unique=True,
+                        postgresql_where=ACTIVE_WHERE,
+                        sqlite_where=ACTIVE_WHERE)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_conversion_jobs_active_user',
+                  table_name='conversion_jobs')
+    op.drop_index('ix_conversion_jobs_telegram_id_status',
+                  table_name='conversion_jobs')
+    op.drop_index('ix_conversion_jobs_status_priority_id',
+                  table_name='conversion_jobs')
+    op.drop_table('conversion_jobs')
@@ -0,0 +1,201 @@
+"""
+Локальная проверка webhook-режима без Telegram
+
+Поднимает заглушку Bot API (отвечает на вызовы бота и отдаёт файлы)
+и шлёт в webhook синтетические обновления: /start, несколько фото и
+/convert от каждого пользователя. В конце - коды ответов webhook,
+задержки и сколько PDF бот «отправил».
+
+Сначала запускается скрипт (он поднимает заглушку и ждёт готовности
+бота на /healthz), затем в другом терминале бот, смотрящий на заглушку:
+
+    python scripts/webhook_smoke.py --users 20 --photos 3 --secret local-secret
+
+    BOT_MODE=webhook WEBHOOK_URL= WEBHOOK_SECRET=local-secret \
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123456:TEST \
+    python main.py
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+
+from aiohttp import ClientSession, web
+from PIL import Image
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'PDFConverter', 'username': 'pdf_test_bot'}
+
+
+class FakeBotApi:
+    """Заглушка Bot API: запоминает вызовы и отвечает правдоподобными объектами."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.documents = set()
+        self._message_ids = itertools.count(1000)
+        self._photo = self._make_photo()
+
+    @staticmethod
+    def _make_photo() -> bytes:
+        buffer = io.BytesIO()
+        Image.radial_gradient('L').resize((1600, 1200)).convert('RGB').save(
+            buffer, format='JPEG', quality=90)
+        return buffer.getvalue()
+
+    def _message(self, chat_id, **extra) -> dict:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': BOT_USER,
+            **extra,
+        }
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = {key: value for key, value in (await request.post()).items()
+                      if isinstance(value, str)}
+        chat_id = params.get('chat_id', 0)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            result = self._message(chat_id, text=params.get('text', ''))
+        elif method == 'sendDocument':
+            self.documents.add(int(chat_id))
+            result = self._message(chat_id, document={
+                'file_id': f'pdf-{chat_id}-{time.time_ns()}',
+                'file_unique_id': f'pdf-{chat_id}',
+            })
+        elif method == 'getFile':
+            file_id = params['file_id']
+            result = {'file_id': file_id, 'file_unique_id': file_id,
+                      'file_size': len(self._photo), 'file_path': f'photos/{file_id}.jpg'}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        self.calls['download'] += 1
+        return web.Response(body=self._photo, content_type='image/jpeg')
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle_method)
+        app.router.add_get('/file/bot{token}/{path:.+}', self.handle_file)
+        return app
+
+
+def make_update(update_id: int, user_id: int, **message) -> dict:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}',
+            'is_premium': user_id % 5 == 0}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+            **message,
+        },
+    }
+
+
+async def post_update(session: ClientSession, url: str, secret: str,
+                      update: dict, statuses: Counter, latencies: list) -> None:
+    started = time.perf_counter()
+    async with session.post(url, data=json.dumps(update),
+                            headers={'Content-Type': 'application/json',
+                                     'X-Telegram-Bot-Api-Secret-Token': secret}) as response:
+        await response.read()
+        statuses[response.status] += 1
+    latencies.append(time.perf_counter() - started)
+
+
+async def user_session(session, args, user_id, update_ids, statuses, latencies):
+    post = lambda update: post_update(session, args.webhook_url, args.secret,
+                                      update, statuses, latencies)
+    await post(make_update(next(update_ids), user_id, text='/start'))
+    photos = []
+    for index in range(args.photos):
+        file_id = f'photo-{user_id}-{index}'
+        photos.append(post(make_update(next(update_ids), user_id, photo=[{
+            'file_id': file_id, 'file_unique_id': file_id,
+            'width': 1600, 'height': 1200, 'file_size': 100_000}])))
+    await asyncio.gather(*photos)
+    # Как настоящий пользователь: команда чуть позже загрузок
+    await asyncio.sleep(0.5)
+    await post(make_update(next(update_ids), user_id, text='/convert'))
+
+
+async def wait_ready(session: ClientSession, url: str, timeout: float) -> bool:
+    """Ждать, пока /healthz бота не ответит 200."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    print(f'/healthz: {await response.text()}')
+                    return True
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def main(args) -> int:
+    api = FakeBotApi()
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.api_port).start()
+    print(f'Заглушка Bot API: http://127.0.0.1:{args.api_port}')
+
+    statuses, latencies = Counter(), []
+    update_ids = itertools.count(1)
+    users = range(100_000, 100_000 + args.users)
+    try:
+        async with ClientSession() as session:
+            if not await wait_ready(session, args.health_url, args.timeout):
+                print(f'Бот не ответил готовностью на {args.health_url}')
+                return 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                user_session(session, args, user_id, update_ids, statuses, latencies)
+                for user_id in users))
+            print(f'Отправлено обновлений: {sum(statuses.values())} '
+                  f'за {time.perf_counter() - started:.2f} с, коды: {dict(statuses)}')
+            print(f'Ответ webhook: медиана {statistics.median(latencies) * 1000:.1f} мс, '
+                  f'максимум {max(latencies) * 1000:.1f} мс')
+
+            deadline = time.monotonic() + args.timeout
+            while len(api.documents) < args.users and time.monotonic() < deadline:
+                await asyncio.sleep(0.5)
+            print(f'PDF получили {len(api.documents)}/{args.users} пользователей '
+                  f'за {time.perf_counter() - started:.1f} с')
+            print(f'Вызовы Bot API: {dict(api.calls)}')
+    finally:
+        await runner.cleanup()
+    return 0 if len(api.documents) == args.users else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Синтетическая нагрузка на webhook')
+    parser.add_argument('--webhook-url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--health-url', default='http://127.0.0.1:8080/healthz')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--photos', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='сколько ждать готовности бота и отправки всех PDF, сек')
+    sys.exit(asyncio.run(main(parser.parse_args())))
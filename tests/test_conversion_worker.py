@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from crud.conversion_job import crud_conversion_job
+from database.models import Base, ConversionJob
+from utils import conversion_worker
+from utils.conversion_worker import ConversionWorker
+from utils.converter_executor import ConversionTimeout
+
+
+class FailingExecutor:
+    """Пул конвертации, в котором каждая задача падает с error."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def run(self, func, *args, **kwargs):
+        raise self.error
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.sqlite'}")
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(conversion_worker, 'AsyncSessionLocal', factory)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield factory
+    asyncio.run(engine.dispose())
+
+
+def run_failing_job(session_factory, monkeypatch, error: Exception,
+                    max_attempts: int = 3) -> ConversionJob:
+    """Поставить задачу, выполнить её воркером с падающим пулом, вернуть из БД."""
+    monkeypatch.setattr(conversion_worker, 'conversion_executor', FailingExecutor(error))
+    worker = ConversionWorker('test-worker', concurrency=1, poll_interval=0.1,
+                              heartbeat_interval=60, visibility_timeout=600)
+
+    async def scenario():
+        async with session_factory() as session:
+            await crud_conversion_job.enqueue(
+                session, telegram_id=1, chat_id=1, message_id=1,
+                input_dir='/in', output_dir='/out', number_of_files=1,
+                settings={}, max_attempts=max_attempts)
+        async with session_factory() as session:
+            job = await crud_conversion_job.claim('test-worker', 600, session)
+        result = await worker.process(job)
+        async with session_factory() as session:
+            return result, await session.get(ConversionJob, job.id)
+
+    return asyncio.run(scenario())
+
+
+def test_timeout_fails_job_without_retry(session_factory, monkeypatch):
+    result, job = run_failing_job(session_factory, monkeypatch,
+                                  ConversionTimeout('не уложились'))
+
+    assert result == 'error'
+    assert job.status == ConversionJob.FAILED
+    assert job.attempts == 1
+    assert job.worker_id is None
+
+
+def test_error_fails_job_when_attempts_run_out(session_factory, monkeypatch):
+    result, job = run_failing_job(session_factory, monkeypatch, RuntimeError('сбой'),
+                                  max_attempts=1)
+
+    assert result == 'error'
+    assert job.status == ConversionJob.FAILED
+    assert 'RuntimeError' in job.error
+
+
+def test_error_returns_job_to_queue(session_factory, monkeypatch):
+    result, job = run_failing_job(session_factory, monkeypatch, RuntimeError('сбой'))
+
+    # Обычная ошибка повторяется: задача снова в очереди, а не висит в running
+    assert result == 'retry'
+    assert job.status == ConversionJob.QUEUED
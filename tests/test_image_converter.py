@@ -0,0 +1,96 @@
+import io
+
+import pytest
+from PIL import Image
+
+from utils import image_converter
+from utils.image_converter import (PageCache, compress_image,
+                                   image_converter_to_pdf)
+from utils.metrics import (PAGE_CACHE_EVICTIONS, PAGE_CACHE_HITS,
+                           PAGE_CACHE_MISSES)
+
+
+@pytest.fixture(autouse=True)
+def no_page_cache(monkeypatch):
+    monkeypatch.setattr(image_converter, 'page_cache', None)
+
+
+def make_16bit_png(path):
+    img = Image.new('I;16', (300, 200))
+    img.putdata([(i * 7) % 65536 for i in range(300 * 200)])
+    img.save(path)
+
+
+def test_compress_16bit_png_to_jpeg(tmp_path):
+    path = tmp_path / '1_gray16.png'
+    make_16bit_png(path)
+
+    result = compress_image(str(path), max_size=(100, 100))
+
+    with Image.open(io.BytesIO(result)) as img:
+        assert img.format == 'JPEG'
+        assert img.mode == 'L'
+        # Диапазон сжат до 8 бит, а не обрезан в белый
+        assert img.getextrema()[0] < 128
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_pdf_from_16bit_png_and_cmyk(tmp_path, streaming):
+    path_in, path_out = tmp_path / 'IN', tmp_path / 'OUT'
+    path_in.mkdir()
+    path_out.mkdir()
+    make_16bit_png(path_in / '1_gray16.png')
+    Image.new('CMYK', (300, 200), (10, 20, 30, 40)).save(path_in / '2_cmyk.tiff')
+
+    result = image_converter_to_pdf(str(path_in), str(path_out), 7,
+                                    workers=1, streaming=streaming)
+
+    assert result is not None
+    with open(result, 'rb') as f:
+        assert f.read(5) == b'%PDF-'
+
+
+def test_streaming_accepts_page_left_as_original(tmp_path, monkeypatch):
+    """compress_image при ошибке отдаёт оригинал - PDF всё равно собирается."""
+    path_in, path_out = tmp_path / 'IN', tmp_path / 'OUT'
+    path_in.mkdir()
+    path_out.mkdir()
+    make_16bit_png(path_in / '1_gray16.png')
+    monkeypatch.setattr(image_converter, 'compress_image',
+                        lambda image, **kwargs: image_converter.read_source(image))
+
+    result = image_converter_to_pdf(str(path_in), str(path_out), 7,
+                                    workers=1, streaming=True)
+
+    assert result is not None
+
+
+def test_page_cache_shared_between_processes(tmp_path):
+    # Два экземпляра на одной папке - как бот и процесс пула
+    first = PageCache(str(tmp_path), max_bytes=250, ttl=3600)
+    second = PageCache(str(tmp_path), max_bytes=250, ttl=3600)
+    first.put('aa1', b'x' * 100)
+
+    assert second.get('aa1') == b'x' * 100
+
+    # Лимит общий: при пересборке индекса учитываются и чужие записи
+    second.put('bb2', b'y' * 100)
+    second.put('cc3', b'z' * 100)
+    assert first.get('aa1') is None
+    assert second.stats()['bytes'] <= 250
+
+
+def test_page_cache_metrics(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=150, ttl=3600)
+    hits, misses = PAGE_CACHE_HITS.get(), PAGE_CACHE_MISSES.get()
+    evictions = PAGE_CACHE_EVICTIONS.get()
+
+    assert cache.get('aa1') is None
+    cache.put('aa1', b'x' * 100)
+    assert cache.get('aa1') == b'x' * 100
+    cache.put('bb2', b'y' * 100)
+
+    assert PAGE_CACHE_HITS.get() - hits == 1
+    assert PAGE_CACHE_MISSES.get() - misses == 1
+    assert PAGE_CACHE_EVICTIONS.get() - evictions == 1
+
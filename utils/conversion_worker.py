@@ -0,0 +1,225 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict, Optional
+
+from core.core import (CONVERTER_PAGE_WORKERS, CONVERTER_STREAMING_PDF,
+                       JOB_HEARTBEAT_INTERVAL, JOB_POLL_INTERVAL,
+                       JOB_VISIBILITY_TIMEOUT, WORKER_CONCURRENCY, WORKER_ID)
+from core.logger import setup_logger
+from crud.conversion_job import crud_conversion_job
+from database.engine import AsyncSessionLocal
+from database.models import ConversionJob
+from utils.converter_executor import ConversionTimeout, conversion_executor
+from utils.image_converter import image_converter_to_pdf
+from utils.job_manifest import (collect_inputs, find_reusable_pdf,
+                                save_manifest)
+from utils.metrics import ASSEMBLY_SECONDS, JOB_SECONDS, JOBS, PDF_BYTES
+from utils.temp_buffer import delete_files_in_folder
+
+logger = setup_logger(__name__)
+
+# Как часто завершать задачи, брошенные без попыток, сек
+ABANDONED_CHECK_INTERVAL = 30
+
+# Попытки записать итог задачи в БД: пауза 1, 2, 4... сек
+SAVE_RETRIES = 5
+
+
+def run_job(path_in: str, path_out: str, message_id: int,
+            settings: Dict[str, Any]) -> Optional[str]:
+    """
+    Конвертация файлов задачи (выполняется в пуле воркеров)
+
+    Как и в процессе бота: если входные файлы не менялись с прошлой
+    попытки, возвращается уже собранный PDF.
+    """
+    inputs = collect_inputs(path_in)
+    result_filename = find_reusable_pdf(path_in, inputs, settings)
+    if result_filename:
+        logger.info(f"♻️ Входные файлы не изменились, используем {result_filename}")
+        return result_filename
+
+    delete_files_in_folder(path_out)
+    result_filename = image_converter_to_pdf(
+        path_in,
+        path_out,
+        message_id,
+        workers=CONVERTER_PAGE_WORKERS,
+        streaming=CONVERTER_STREAMING_PDF,
+        **settings
+    )
+    if result_filename:
+        save_manifest(path_in, inputs, result_filename, settings)
+    return result_filename
+
+
+class ConversionWorker:
+    """
+    Воркер очереди conversion_jobs (запускается через worker.py)
+
+    concurrency циклов по очереди забирают задачи из БД и выполняют
+    их в пуле конвертации. Пока задача выполняется, воркер раз в
+    heartbeat_interval продлевает её; если процесс упадёт, задачу
+    через visibility_timeout заберёт другой воркер. Результат остаётся
+    на общем диске, отправляет его бот.
+    """
+
+    def __init__(
+        self,
+        worker_id: str,
+        concurrency: int,
+        poll_interval: float,
+        heartbeat_interval: float,
+        visibility_timeout: float,
+    ):
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.visibility_timeout = visibility_timeout
+        self.active = 0
+        self._abandoned_checked = 0.0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Брать задачи, пока не установлен stop; взятые - доделать."""
+        logger.info(f"Воркер {self.worker_id} запущен, задач одновременно: "
+                    f"{self.concurrency}")
+        await asyncio.gather(*(self._loop(stop) for _ in range(self.concurrency)))
+        logger.info(f"Воркер {self.worker_id} остановлен")
+
+    async def _loop(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Не удалось получить задачу: {e}", exc_info=True)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.active += 1
+            try:
+                await self.process(job)
+            except Exception as e:
+                # Задача останется running и через visibility_timeout
+                # достанется другому воркеру; этот цикл продолжает работу
+                logger.error(f"Ошибка обработки задачи {job.id}: {e}", exc_info=True)
+            finally:
+                self.active -= 1
+
+    async def _claim(self) -> Optional[ConversionJob]:
+        async with AsyncSessionLocal() as session:
+            now = time.monotonic()
+            if now - self._abandoned_checked > ABANDONED_CHECK_INTERVAL:
+                self._abandoned_checked = now
+                failed = await crud_conversion_job.fail_abandoned(
+                    self.visibility_timeout, session)
+                if failed:
+                    logger.warning(f"Брошенных задач без попыток: {failed}")
+            return await crud_conversion_job.claim(
+                self.worker_id, self.visibility_timeout, session)
+
+    async def _heartbeat(self, job: ConversionJob) -> None:
+        """Продлевать задачу, пока она выполняется."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with AsyncSessionLocal() as session:
+                    alive = await crud_conversion_job.heartbeat(
+                        job.id, self.worker_id, session)
+            except Exception as e:
+                logger.warning(f"Не удалось продлить задачу {job.id}: {e}")
+                continue
+            if not alive:
+                # Результат всё равно не запишется: complete() проверит worker_id
+                logger.warning(f"Задачу {job.id} забрал другой воркер")
+                return
+
+    async def process(self, job: ConversionJob) -> str:
+        """Выполнить задачу и записать результат. Возвращает итог для метрик."""
+        logger.info(f"Задача {job.id}: пользователь {job.telegram_id}, "
+                    f"файлов {job.number_of_files}, попытка {job.attempts}/{job.max_attempts}")
+        started = time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        error, retry = None, True
+        # Останется None, если конвертация упала или не уложилась в таймаут
+        result_filename = None
+        try:
+            try:
+                with ASSEMBLY_SECONDS.time():
+                    result_filename = await conversion_executor.run(
+                        run_job, job.input_dir, job.output_dir, job.message_id,
+                        job.settings or {})
+                if not result_filename or not os.path.exists(result_filename):
+                    error, retry = 'PDF не создан', False
+            except ConversionTimeout as e:
+                # Повтор упрётся в тот же таймаут
+                error, retry = str(e), False
+            except Exception as e:
+                logger.error(f"Ошибка задачи {job.id}: {e}", exc_info=True)
+                error = f'{type(e).__name__}: {e}'
+
+            if error is None:
+                PDF_BYTES.inc(os.path.getsize(result_filename))
+            # Пока итог не записан, задача продлевается: сбой БД не должен
+            # отдать готовый PDF другому воркеру на повторную конвертацию
+            result = await self._save_result(job, error, retry, result_filename)
+        finally:
+            heartbeat.cancel()
+
+        elapsed = time.perf_counter() - started
+        JOBS.inc(result=result)
+        JOB_SECONDS.observe(elapsed, result=result)
+        if result == 'success':
+            logger.info(f"✅ Задача {job.id} выполнена за {elapsed:.2f}с")
+        else:
+            logger.warning(f"Задача {job.id}: {result} за {elapsed:.2f}с ({error})")
+        return result
+
+    async def _save_result(self, job: ConversionJob, error: Optional[str],
+                           retry: bool, result_filename: Optional[str]) -> str:
+        """
+        Записать итог задачи в БД, повторяя при ошибках
+
+        Returns:
+            итог для метрик: success, retry, error или lost (задачу забрал
+            другой воркер либо записать итог не удалось)
+        """
+        for attempt in range(1, SAVE_RETRIES + 1):
+            try:
+                async with AsyncSessionLocal() as session:
+                    if error is None:
+                        saved = await crud_conversion_job.complete(
+                            job, self.worker_id, result_filename,
+                            os.path.getsize(result_filename), session)
+                        return 'success' if saved else 'lost'
+                    status = await crud_conversion_job.fail(
+                        job, self.worker_id, error, session, retry=retry)
+                    return {ConversionJob.QUEUED: 'retry',
+                            ConversionJob.FAILED: 'error'}.get(status, 'lost')
+            except Exception as e:
+                logger.warning(f"Не удалось записать итог задачи {job.id} "
+                               f"(попытка {attempt}/{SAVE_RETRIES}): {e}")
+                if attempt < SAVE_RETRIES:
+                    await asyncio.sleep(2 ** (attempt - 1))
+        logger.error(f"Итог задачи {job.id} не записан, её заберёт другой воркер")
+        return 'lost'
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+conversion_worker = ConversionWorker(
+    worker_id=WORKER_ID or default_worker_id(),
+    concurrency=WORKER_CONCURRENCY,
+    poll_interval=JOB_POLL_INTERVAL,
+    heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+    visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+)
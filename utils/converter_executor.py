@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from core.core import (CONVERTER_EXECUTOR, CONVERTER_JOB_TIMEOUT,
+                       CONVERTER_MAX_JOBS, CONVERTER_WORKERS)
+from core.logger import (configure_child_logging, get_child_log_queue,
+                         setup_logger)
+
+logger = setup_logger(__name__)
+
+
+class ConversionTimeout(Exception):
+    """Задача конвертации не уложилась в отведённое время."""
+
+
+class ConversionExecutor:
+    """
+    Пул воркеров для тяжёлой синхронной работы с изображениями.
+
+    Обработчики ждут результат через await, поэтому event loop
+    продолжает отвечать остальным пользователям, пока идёт конвертация.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 2,
+        max_jobs: int = 2,
+        timeout: Optional[float] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_jobs)
+
+    def _get_pool(self) -> Executor:
+        """Пул создаётся лениво, при первой задаче."""
+        if self._pool is None:
+            if self.kind == "process":
+                # Логи процессов пула выводит родитель
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=configure_child_logging,
+                    initargs=(get_child_log_queue(),),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="converter",
+                )
+            logger.info(f"Создан пул конвертации: {self.kind}, воркеров: {self.max_workers}")
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить func в пуле и дождаться результата.
+
+        Одновременно выполняется не больше max_jobs задач, остальные
+        ждут своей очереди. Время ожидания в очереди в таймаут не входит.
+        Слот освобождается, когда задача действительно завершилась в пуле,
+        а не когда её перестали ждать по таймауту.
+        """
+        await self._semaphore.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_pool(), partial(func, *args, **kwargs))
+        except BaseException:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(self._on_done)
+        try:
+            # shield: отмена ожидания не должна отменять саму задачу
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # Уже запущенный воркер прервать нельзя: он доработает
+            # в фоне и только тогда освободит слот
+            logger.error(f"Задача {getattr(func, '__name__', func)} "
+                         f"превысила таймаут {self.timeout} сек")
+            raise ConversionTimeout(
+                f"Конвертация не завершилась за {self.timeout} сек")
+
+    def _on_done(self, future: asyncio.Future) -> None:
+        self._semaphore.release()
+        # Ошибку задачи, которую перестали ждать, достаём, чтобы asyncio
+        # не ругался на неполученное исключение
+        if not future.cancelled():
+            future.exception()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Остановить пул. Незапущенные задачи отменяются."""
+        if self._pool is None:
+            return
+        logger.info("Останавливаем пул конвертации...")
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._pool = None
+        logger.info("Пул конвертации остановлен")
+
+
+conversion_executor = ConversionExecutor(
+    kind=CONVERTER_EXECUTOR,
+    max_workers=CONVERTER_WORKERS,
+    max_jobs=CONVERTER_MAX_JOBS,
+    timeout=CONVERTER_JOB_TIMEOUT,
+)
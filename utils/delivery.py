@@ -0,0 +1,321 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (TelegramAPIError, TelegramBadRequest,
+                                TelegramNetworkError, TelegramRetryAfter)
+from aiogram.types import FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.core import DELIVERY_POLL_INTERVAL, JOB_RETENTION
+from core.logger import setup_logger
+from crud.conversion_job import crud_conversion_job
+from crud.uploaded_file import crud_uploaded_file
+from database.engine import AsyncSessionLocal
+from database.models import ConversionJob
+from utils.hashing import get_file_hash
+from utils.memory_staging import memory_staging
+from utils.metrics import (DB_SECONDS, FLOOD_WAIT_SECONDS, FLOOD_WAITS,
+                           UPLOAD_RETRIES, UPLOAD_SECONDS)
+from utils.temp_buffer import storage
+
+logger = setup_logger(__name__)
+
+SEND_FAILED_TEXT = (
+    "❌ *Ошибка отправки*\n"
+    "Не удалось отправить файл из-за проблем с сетью.\n"
+    "*Ваши файлы сохранены!*\n\n"
+    "Просто отправьте команду /convert ещё раз, "
+    "когда соединение восстановится.\n"
+    "Повторно загружать изображения **не нужно**."
+)
+
+
+async def send_file_with_retry(
+    bot: Bot,
+    chat_id: int,
+    file_path: str,
+    caption: str = None,
+    max_retries: int = 3,
+    file_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    Отправка файла с повторными попытками и логированием
+
+    Если передан file_id уже загруженного файла, отправляем по нему
+    без повторной загрузки байтов. Если Telegram его не принял,
+    загружаем файл заново.
+
+    Returns:
+        file_id отправленного документа или None, если отправить не удалось
+    """
+
+    logger.info(f"Начало отправки файла {file_path}")
+    logger.debug(f"Параметры: max_retries={max_retries}, caption={caption}, "
+                 f"file_id={file_id}")
+
+    attempt = 0
+    while attempt < max_retries:
+        attempt += 1
+        try:
+            logger.debug(f"Попытка {attempt}/{max_retries} отправки файла")
+
+            file_to_send = file_id or FSInputFile(file_path)
+            with UPLOAD_SECONDS.time(method='file_id' if file_id else 'upload'):
+                sent = await bot.send_document(
+                    chat_id=chat_id,
+                    document=file_to_send,
+                    caption=caption,
+                    reply_markup=None
+                )
+
+            file_size = os.path.getsize(file_path) / 1024  # в KB
+            source = "по file_id" if file_id else "загрузкой"
+            logger.info(f"Файл успешно отправлен {source}! Размер: {file_size:.2f} KB, "
+                        f"попытка: {attempt}")
+            return sent.document.file_id
+
+        except TelegramRetryAfter as e:
+            wait_time = e.retry_after
+            FLOOD_WAITS.inc()
+            FLOOD_WAIT_SECONDS.inc(wait_time)
+            UPLOAD_RETRIES.inc(reason='flood')
+            logger.warning(f"Flood control от Telegram. Ждём {wait_time} сек (попытка {attempt}/{max_retries})")
+            await asyncio.sleep(wait_time)
+
+        except TelegramNetworkError as e:
+            logger.warning(f"Сетевая ошибка: {e}. Попытка {attempt}/{max_retries}")
+            UPLOAD_RETRIES.inc(reason='network')
+            if attempt < max_retries:
+                wait_time = 2 ** attempt  # 2, 4, 8 секунд
+                logger.debug(f"Повтор через {wait_time} сек")
+                await asyncio.sleep(wait_time)
+            else:
+                logger.error(f"Исчерпаны все попытки отправки из-за сетевой ошибки")
+
+        except TelegramBadRequest as e:
+            if file_id:
+                # file_id устарел или недоступен - эта попытка не считается
+                logger.warning(f"file_id не принят ({e}), загружаем файл заново")
+                UPLOAD_RETRIES.inc(reason='bad_file_id')
+                file_id = None
+                attempt -= 1
+                continue
+            logger.error(f"Bad request ошибка: {e}", exc_info=True)
+            UPLOAD_RETRIES.inc(reason='bad_request')
+            # Такую ошибку повторять бесполезно
+            break
+
+        except TelegramAPIError as e:
+            logger.error(f"Ошибка Telegram API: {e}", exc_info=True)
+            UPLOAD_RETRIES.inc(reason='api')
+            if attempt < max_retries:
+                await asyncio.sleep(3)
+            else:
+                logger.error(f"Исчерпаны все попытки отправки")
+
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при отправке: {e}", exc_info=True)
+            UPLOAD_RETRIES.inc(reason='other')
+            if attempt < max_retries:
+                await asyncio.sleep(3)
+            else:
+                logger.error(f"Исчерпаны все попытки отправки")
+
+    return None
+
+
+async def deliver_pdf(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    session: AsyncSession,
+    result_filename: str,
+    file_count: int,
+    file_size: Optional[int] = None,
+) -> bool:
+    """
+    Отправить готовый PDF пользователю
+
+    При успехе временные файлы пользователя удаляются, при неудаче
+    остаются для повторного /convert, а пользователь получает
+    сообщение об ошибке.
+
+    Returns:
+        bool: удалось ли отправить
+    """
+    logger.info(f"📤 Начало отправки результата пользователю {user_id}")
+
+    # Тот же PDF уже загружался (повтор, тот же альбом в другом чате) -
+    # отправляем по file_id без повторной загрузки
+    pdf_hash = await asyncio.to_thread(get_file_hash, result_filename)
+    known_file_id = None
+    try:
+        with DB_SECONDS.time(operation='file_id_lookup'):
+            uploaded = await crud_uploaded_file.get_by_hash(pdf_hash, session)
+        if uploaded:
+            known_file_id = uploaded.file_id
+            logger.info(f"PDF уже загружался в Telegram, отправляем по file_id")
+    except Exception as e:
+        logger.error(f"Не удалось найти file_id в БД: {e}")
+        await session.rollback()
+    finally:
+        # Не держим соединение из пула на время загрузки файла
+        await session.close()
+
+    caption = f"✅ Конвертировано файлов: {file_count}"
+    sent_file_id = await send_file_with_retry(
+        bot,
+        chat_id,
+        result_filename,
+        caption=caption,
+        file_id=known_file_id
+    )
+    success = sent_file_id is not None
+
+    if success and sent_file_id != known_file_id:
+        try:
+            with DB_SECONDS.time(operation='file_id_save'):
+                await crud_uploaded_file.save_file_id(
+                    pdf_hash,
+                    sent_file_id,
+                    file_size,
+                    session)
+            logger.debug(f"file_id сохранён для {pdf_hash}")
+        except Exception as e:
+            logger.error(f"Не удалось сохранить file_id: {e}")
+            await session.rollback()
+
+    # ✅ КРИТИЧЕСКОЕ ИЗМЕНЕНИЕ: Удаляем файлы ТОЛЬКО при успешной отправке
+    if success:
+        logger.info(f"Отправка успешна, очищаем временные файлы...")
+        try:
+            await asyncio.sleep(2)
+            if memory_staging is not None:
+                memory_staging.clear(user_id)
+
+            # Удаляем папки вместе с файлами и манифестом
+            freed = storage.remove_user(user_id)
+            logger.debug(f"Временные папки удалены, освобождено {freed} bytes")
+        except Exception as e:
+            logger.error(f"❌ Ошибка при удалении временных файлов: {e}")
+    else:
+        logger.warning(f"⚠️ Файлы НЕ УДАЛЕНЫ - отправка не удалась. "
+                       f"Пользователь {user_id} может повторить попытку позже")
+
+        # Отправляем сообщение пользователю
+        try:
+            await bot.send_message(chat_id, SEND_FAILED_TEXT, parse_mode='html')
+        except Exception as e:
+            logger.error(f"Не удалось отправить сообщение об ошибке: {e}")
+
+    return success
+
+
+class JobDelivery:
+    """
+    Отправка результатов задач, выполненных воркерами (CONVERSION_MODE=distributed)
+
+    Каждые poll_interval секунд забирает из conversion_jobs завершённые,
+    но не доставленные задачи и отправляет пользователям PDF или
+    сообщение об ошибке. Раз в час удаляет доставленные задачи старше
+    retention.
+    """
+
+    def __init__(self, poll_interval: float, retention: float, batch_size: int = 10):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        # Пользователи этой реплики, чьи задачи ещё не доставлены:
+        # их папки нельзя убирать
+        self._outstanding: Set[int] = set()
+        self._purged_at: Optional[datetime] = None
+        self._stopping = asyncio.Event()
+
+    def track(self, user_id: int) -> None:
+        self._outstanding.add(user_id)
+
+    def is_pending(self, user_id: int) -> bool:
+        return user_id in self._outstanding
+
+    async def deliver(self, job: ConversionJob) -> None:
+        """Отправить результат одной задачи."""
+        try:
+            if job.status == ConversionJob.DONE and job.result_path \
+                    and os.path.exists(job.result_path):
+                async with AsyncSessionLocal() as session:
+                    await deliver_pdf(self._bot, job.chat_id, job.telegram_id,
+                                      session, job.result_path,
+                                      job.number_of_files, job.file_size)
+            elif job.status == ConversionJob.DONE:
+                logger.error(f"Задача {job.id}: файл {job.result_path} не найден")
+                await self._bot.send_message(
+                    job.chat_id, '❌ Не найден исходящий файл для отправки')
+            else:
+                logger.warning(f"Задача {job.id} завершилась ошибкой: {job.error}")
+                await self._bot.send_message(
+                    job.chat_id, '❌ Ошибка при конвертации файлов. '
+                                 'Отправьте /convert, чтобы попробовать ещё раз')
+        except Exception as e:
+            logger.error(f"Не удалось доставить задачу {job.id}: {e}", exc_info=True)
+        finally:
+            self._outstanding.discard(job.telegram_id)
+
+    async def deliver_batch(self) -> int:
+        """Доставить очередную пачку задач. Возвращает их число."""
+        async with AsyncSessionLocal() as session:
+            jobs = await crud_conversion_job.claim_for_delivery(
+                session, limit=self.batch_size)
+        if jobs:
+            await asyncio.gather(*(self.deliver(job) for job in jobs))
+        return len(jobs)
+
+    async def purge(self) -> None:
+        now = datetime.now()
+        if self._purged_at is not None and now - self._purged_at < timedelta(hours=1):
+            return
+        self._purged_at = now
+        async with AsyncSessionLocal() as session:
+            removed = await crud_conversion_job.purge_delivered(
+                now - timedelta(seconds=self.retention), session)
+        if removed:
+            logger.info(f"Удалено доставленных задач: {removed}")
+
+    async def run(self) -> None:
+        """Цикл доставки до stop()."""
+        while not self._stopping.is_set():
+            try:
+                delivered = await self.deliver_batch()
+                await self.purge()
+            except Exception as e:
+                logger.error(f"Ошибка доставки результатов: {e}", exc_info=True)
+                delivered = 0
+            # Пачка была полной - возможно, ждут ещё
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self, bot: Bot) -> None:
+        if self._task is None:
+            self._bot = bot
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"Доставка результатов запущена, интервал {self.poll_interval} сек")
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Дать доотправить уже взятые задачи: delivered_at у них отмечен."""
+        if self._task is not None:
+            self._stopping.set()
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+
+
+job_delivery = JobDelivery(DELIVERY_POLL_INTERVAL, JOB_RETENTION)
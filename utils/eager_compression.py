@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional, Set
+
+from core.constants import (CONVERT_MAX_HEIGHT, CONVERT_MAX_WIDTH,
+                            CONVERT_QUALITY)
+from core.core import (EAGER_COMPRESSION, EAGER_COMPRESSION_QUEUE,
+                       EAGER_COMPRESSION_WORKERS)
+from core.logger import setup_logger
+from utils.image_converter import ImageSource, compress_page, page_cache
+
+logger = setup_logger(__name__)
+
+# Насколько понизить приоритет потоков заранее сжатия (nice)
+EAGER_NICE = 10
+
+
+def _lower_priority() -> None:
+    """Понизить приоритет потока пула (Linux: nice действует на поток)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), EAGER_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+class EagerCompressor:
+    """
+    Сжатие страниц сразу после загрузки, пока пользователь досылает файлы
+
+    Работает по возможности: у него свой маленький пул потоков с
+    пониженным приоритетом, а не общий conversion_executor, так что
+    конвертации по /convert его не ждут. Если в очереди уже max_queued
+    страниц, новые не ставятся. /convert не ждёт эти задачи, а отменяет
+    ещё не начатые: страницы, которых нет в кэше, сожмёт сама конвертация.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._tasks: Dict[int, Set[asyncio.Task]] = defaultdict(set)
+        self.queued = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="eager",
+                initializer=_lower_priority,
+            )
+        return self._pool
+
+    def submit(self, user_id: int, image: ImageSource, name: str) -> bool:
+        """
+        Поставить страницу на сжатие
+
+        Returns:
+            bool: False - очередь заполнена, страница будет сжата при /convert
+        """
+        if self.queued >= self.max_queued:
+            logger.debug(f"Очередь заранее сжатия заполнена, пропускаем {name}")
+            return False
+
+        self.queued += 1
+        task = asyncio.create_task(self._prepare(image, name))
+        tasks = self._tasks[user_id]
+        tasks.add(task)
+
+        def _forget(done: asyncio.Task) -> None:
+            self.queued -= 1
+            tasks.discard(done)
+            if not tasks and self._tasks.get(user_id) is tasks:
+                del self._tasks[user_id]
+
+        task.add_done_callback(_forget)
+        return True
+
+    async def _prepare(self, image: ImageSource, name: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._get_pool(), partial(
+                compress_page,
+                image,
+                mode='eager',
+                quality=CONVERT_QUALITY,
+                max_size=(CONVERT_MAX_WIDTH, CONVERT_MAX_HEIGHT)
+            ))
+            logger.debug(f"Страница подготовлена заранее: {name}")
+        except Exception as e:
+            # Не страшно: страница будет сжата при конвертации
+            logger.warning(f"Не удалось подготовить страницу {name}: {e}")
+
+    def count(self, user_id: int) -> int:
+        """Сколько страниц пользователя ещё ждут сжатия."""
+        return len(self._tasks.get(user_id, ()))
+
+    def cancel(self, user_id: int) -> int:
+        """
+        Отменить ещё не начатые задачи пользователя
+
+        Уже выполняющиеся в потоке доработают и положат страницу в кэш,
+        но их результат никто не ждёт. Возвращает число задач.
+        """
+        tasks = list(self._tasks.get(user_id, ()))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Остановить пул. Незапущенные задачи отменяются."""
+        for tasks in list(self._tasks.values()):
+            for task in list(tasks):
+                task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+# None - заранее не сжимаем (выключено или нет кэша страниц)
+eager_compressor = (
+    EagerCompressor(EAGER_COMPRESSION_WORKERS, EAGER_COMPRESSION_QUEUE)
+    if EAGER_COMPRESSION and page_cache is not None else None
+)
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def get_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 содержимого файла, читается по частям."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
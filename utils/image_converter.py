@@ -1,43 +1,417 @@
+import hashlib
 import img2pdf
+import math
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from PIL import Image
 import io
-from typing import List, Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+
+from core.core import PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TTL
+from utils.metrics import (PAGE_CACHE_BYTES, PAGE_CACHE_EVICTIONS,
+                           PAGE_CACHE_HITS, PAGE_CACHE_MISSES,
+                           PAGE_COMPRESS_SECONDS, PAGES)
+from utils.pdf_writer import StreamingPdfWriter
 
 # Настройка логгера для этого модуля
 logger = logging.getLogger(__name__)
 
+# Для маленьких заданий запуск потоков дороже самого сжатия
+SERIAL_THRESHOLD = 4
+
+# JPEG до такого размера, уже влезающий в max_size, не перекодируем
+PASSTHROUGH_MAX_BYTES = 512 * 1024
+
+# Путь к файлу, байты или файловый объект (BytesIO из памяти)
+ImageSource = Union[str, bytes, BinaryIO]
+
+# Форматы, которые берём в PDF
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff')
+
+# Тег EXIF с ориентацией снимка
+EXIF_ORIENTATION = 0x0112
+
+
+class PageCache:
+    """
+    Дисковый кэш сжатых страниц
+    
+    Ключ - хэш исходных байтов вместе с настройками сжатия, поэтому
+    повторная конвертация тех же картинок не трогает Pillow вообще.
+    Вытеснение: по TTL с последнего обращения и по LRU при превышении
+    max_bytes. Время обращения хранится в mtime файла, так что порядок
+    LRU переживает перезапуск бота.
+    
+    Попадания, промахи, вытеснения и объём идут в метрики
+    pdfconverter_page_cache_*. В пуле процессов счётчики, как и прочие
+    метрики сжатия, остаются в дочернем процессе.
+    
+    Папку могут делить несколько процессов (пул конвертации, воркеры):
+    страница ищется прямо на диске по ключу, а индекс для вытеснения
+    раз в rescan_interval собирается заново по папке, так что записи
+    соседей и их объём тоже учитываются. Файловые операции идут без
+    блокировки, под ней меняется только индекс.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, ttl: float,
+                 rescan_interval: float = 300):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # ключ -> (размер, время последнего обращения), от старых к новым
+        self._index: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._scanned_at: Optional[float] = None
+    
+    @staticmethod
+    def make_key(data: bytes, quality: int, max_size: Optional[tuple],
+                 draft: bool) -> str:
+        """Ключ кэша: исходные байты + всё, что влияет на результат."""
+        digest = hashlib.sha256(data)
+        digest.update(f"|q={quality}|size={max_size}|draft={draft}".encode())
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.jpg')
+    
+    def _scan(self) -> OrderedDict:
+        """Собрать индекс по содержимому папки (без блокировки)."""
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for fname in files:
+                    if not fname.endswith('.jpg'):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(root, fname))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, fname[:-4], stat.st_size))
+        entries.sort()
+        return OrderedDict(
+            (key, (size, mtime)) for mtime, key, size in entries)
+    
+    def _refresh(self, now: float, force: bool = False) -> None:
+        """Пересобрать индекс, если он старше rescan_interval."""
+        with self._lock:
+            if (not force and self._scanned_at is not None
+                    and now - self._scanned_at < self.rescan_interval):
+                return
+            # Остальные потоки не сканируют папку одновременно с нами
+            self._scanned_at = now
+        index = self._scan()
+        with self._lock:
+            self._index = index
+            self._total_bytes = sum(size for size, _ in index.values())
+            PAGE_CACHE_BYTES.set(self._total_bytes)
+        logger.debug(f"Кэш страниц: {len(index)} записей, "
+                     f"{self._total_bytes / 1024:.1f}KB")
+    
+    def _forget(self, key: str) -> None:
+        """Убрать запись из индекса (вызывать под блокировкой)."""
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[0]
+    
+    def _touch(self, key: str, size: int, now: float) -> None:
+        """Отметить обращение к записи (вызывать под блокировкой)."""
+        self._forget(key)
+        self._index[key] = (size, now)
+        self._total_bytes += size
+    
+    def _select_victims(self, now: float) -> List[str]:
+        """
+        Убрать из индекса просроченные записи и самые старые сверх лимита
+        
+        Вызывать под блокировкой; файлы удаляет _delete уже без неё.
+        """
+        victims = []
+        while self._index:
+            key, (size, accessed) = next(iter(self._index.items()))
+            if now - accessed > self.ttl or self._total_bytes > self.max_bytes:
+                self._forget(key)
+                victims.append(key)
+            else:
+                break
+        self.evictions += len(victims)
+        if victims:
+            PAGE_CACHE_EVICTIONS.inc(len(victims))
+        return victims
+    
+    def _delete(self, keys: List[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Вернуть страницу из кэша или None."""
+        now = time.time()
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if now - stat.st_mtime > self.ttl:
+                self._delete([key])
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, (now, now))
+        except OSError:
+            # Нет на диске: не сохраняли или удалил другой процесс
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+                PAGE_CACHE_BYTES.set(self._total_bytes)
+            PAGE_CACHE_MISSES.inc()
+            return None
+        with self._lock:
+            # Запись могла появиться от другого процесса - теперь она в индексе
+            self._touch(key, len(data), now)
+            self.hits += 1
+            PAGE_CACHE_BYTES.set(self._total_bytes)
+        PAGE_CACHE_HITS.inc()
+        return data
+    
+    def put(self, key: str, data: bytes) -> None:
+        """Сохранить страницу, вытеснив старые записи при необходимости."""
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        self._refresh(now)
+        path = self._path(key)
+        # Пишем через временный файл, чтобы не отдать недописанную страницу
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("⚠️ Не удалось записать страницу в кэш: %s", e)
+            return
+        with self._lock:
+            self._touch(key, len(data), now)
+            victims = self._select_victims(now)
+            PAGE_CACHE_BYTES.set(self._total_bytes)
+        self._delete(victims)
+    
+    def evict_expired(self) -> None:
+        """Вытеснить просроченные записи (для периодической уборки)."""
+        now = time.time()
+        self._refresh(now, force=True)
+        with self._lock:
+            victims = self._select_victims(now)
+            PAGE_CACHE_BYTES.set(self._total_bytes)
+        self._delete(victims)
+    
+    def stats(self) -> Dict[str, int]:
+        """Счётчики для мониторинга."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+
+# PAGE_CACHE_MAX_BYTES=0 отключает кэш
+page_cache = (PageCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TTL)
+              if PAGE_CACHE_MAX_BYTES > 0 else None)
+
+
+def get_source_name(image: ImageSource) -> str:
+    """Имя источника для логов и сортировки страниц."""
+    if isinstance(image, str):
+        return os.path.basename(image)
+    return getattr(image, 'name', '<память>')
+
+
+def read_source(image: ImageSource) -> bytes:
+    """Байты изображения из файла, bytes или буфера."""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    if isinstance(image, io.BytesIO):
+        return image.getvalue()
+    if hasattr(image, 'read'):
+        image.seek(0)
+        return image.read()
+    with open(image, 'rb') as f:
+        return f.read()
+
+
+def get_source_size(image: ImageSource) -> int:
+    """Размер исходного изображения в байтах."""
+    if isinstance(image, str):
+        return os.path.getsize(image)
+    if isinstance(image, (bytes, bytearray)):
+        return len(image)
+    if isinstance(image, io.BytesIO):
+        return image.getbuffer().nbytes
+    return len(read_source(image))
+
+
+def can_pass_through(
+    img: Image.Image,
+    file_size: int,
+    max_size: tuple = None,
+    max_bytes: Optional[int] = PASSTHROUGH_MAX_BYTES
+) -> bool:
+    """
+    Можно ли отдать исходный файл в PDF без перекодирования
+    
+    Проверяется только заголовок: img2pdf и StreamingPdfWriter встраивают
+    JPEG без потерь, поэтому готовый RGB/Gray JPEG в пределах max_size
+    и бюджета по размеру достаточно просто скопировать.
+    """
+    if not max_bytes or file_size > max_bytes:
+        return False
+    if img.format != 'JPEG' or img.mode not in ('RGB', 'L'):
+        return False
+    if max_size and (img.width > max_size[0] or img.height > max_size[1]):
+        return False
+    # Повёрнутые снимки перекодируем, чтобы страница не зависела от EXIF
+    if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        return False
+    return True
+
+
+def apply_draft(img: Image.Image, max_size: tuple) -> bool:
+    """
+    Просит libjpeg декодировать JPEG сразу в 1/2, 1/4 или 1/8 размера
+    
+    Масштаб выбирается так, чтобы картинка осталась не меньше итогового
+    размера после thumbnail, финальный ресайз делает LANCZOS.
+    Вызывать до загрузки пикселей.
+    
+    Returns:
+        bool: уменьшено ли изображение при декодировании
+    """
+    if img.format != 'JPEG' or not max_size:
+        return False
+    
+    scale = min(max_size[0] / img.width, max_size[1] / img.height)
+    if scale >= 1:
+        return False
+    
+    # Размер, который получится после thumbnail с сохранением пропорций
+    target = (max(1, math.ceil(img.width * scale)),
+              max(1, math.ceil(img.height * scale)))
+    original = img.size
+    img.draft(img.mode, target)
+    if img.size == original:
+        return False
+    
+    logger.debug("⚡ Draft-декодирование: %s → %s", original, img.size)
+    return True
+
+
+def to_jpeg_mode(img: Image.Image) -> Image.Image:
+    """
+    Привести изображение к режиму, который сохраняется в JPEG (RGB, L, CMYK)
 
-def compress_image(image_path: str, quality: int = 85, max_size: tuple = None) -> bytes:
+    16-битные градации серого (PNG, TIFF) сжимаются до 8 бит по диапазону,
+    а не обрезаются по 255, иначе страница получилась бы белой.
+    """
+    if img.mode in ('RGB', 'L', 'CMYK'):
+        return img
+    if img.mode.startswith('I;16') or img.mode in ('I', 'F'):
+        return img.convert('I').point(lambda value: value / 256).convert('L')
+    if img.mode == '1':
+        return img.convert('L')
+    return img.convert('RGB')
+
+
+def ensure_jpeg(data: bytes, quality: int = 85) -> bytes:
+    """
+    Байты страницы в JPEG для StreamingPdfWriter
+
+    compress_image при ошибке отдаёт оригинал (PNG, TIFF...), а потоковая
+    запись встраивает только JPEG - такую страницу перекодируем.
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        return data
+    with Image.open(io.BytesIO(data)) as img:
+        logger.debug("🔁 Страница %s перекодируется в JPEG для потоковой записи",
+                     img.format)
+        output = io.BytesIO()
+        to_jpeg_mode(img).save(output, format='JPEG', quality=quality)
+        return output.getvalue()
+
+
+def compress_image(
+    image: ImageSource,
+    quality: int = 85,
+    max_size: tuple = None,
+    passthrough_max_bytes: Optional[int] = PASSTHROUGH_MAX_BYTES,
+    draft: bool = True,
+    use_cache: bool = True
+) -> bytes:
     """
     Сжимает изображение и возвращает байты для img2pdf
     
     Args:
-        image_path: путь к изображению
+        image: путь к изображению, его байты или буфер в памяти
         quality: качество JPEG (1-100, 85 - хороший баланс)
         max_size: максимальные размеры (width, height)
+        passthrough_max_bytes: JPEG не больше этого размера, уже влезающий
+            в max_size, возвращается без перекодирования (None = всегда сжимать)
+        draft: декодировать большие JPEG в уменьшенном масштабе;
+            False - полное декодирование и точный ресайз без приближений
+        use_cache: брать и сохранять результат в кэше страниц
     
     Returns:
         bytes: сжатое изображение в формате JPEG
     """
+    data = None
+    name = get_source_name(image)
     try:
-        with Image.open(image_path) as img:
+        data = read_source(image)
+        
+        with Image.open(io.BytesIO(data)) as img:
             # Логируем исходные данные
-            logger.debug(f"📸 Оригинал: {image_path}, "
-                        f"размер: {img.size}, "
-                        f"формат: {img.format}, "
-                        f"режим: {img.mode}")
+            logger.debug("📸 Оригинал: %s, размер: %s, формат: %s, режим: %s",
+                         name, img.size, img.format, img.mode)
+            
+            # Быстрый путь: Image.open прочитал только заголовок
+            if can_pass_through(img, len(data), max_size, passthrough_max_bytes):
+                logger.debug("⏩ Без перекодирования: %.1fKB", len(data) / 1024)
+                return data
             
-            # Конвертируем в RGB если нужно
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
+            cache = page_cache if use_cache else None
+            if cache is not None:
+                cache_key = cache.make_key(data, quality, max_size, draft)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("♻️ Страница из кэша: %s", name)
+                    return cached
+            
+            if draft:
+                apply_draft(img, max_size)
+            
+            # Режимы, которые JPEG не сохраняет (RGBA, P, 16 бит...)
+            img = to_jpeg_mode(img)
             
             # Изменяем размер если нужно
             if max_size:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                logger.debug(f"📏 Изменён размер до: {img.size}")
+                # reducing_gap=None отключает приближённое уменьшение
+                # внутри thumbnail, когда нужна точность
+                img.thumbnail(max_size, Image.Resampling.LANCZOS,
+                              reducing_gap=2.0 if draft else None)
+                logger.debug("📏 Изменён размер до: %s", img.size)
             
             # Сохраняем в буфер с сжатием
             output = io.BytesIO()
@@ -47,16 +421,120 @@ def compress_image(image_path: str, quality: int = 85, max_size: tuple = None) -
                     optimize=True,
                     progressive=True)
             
-            compressed_size = len(output.getvalue()) / 1024
-            logger.debug(f"💾 Сжато: {compressed_size:.1f}KB, качество: {quality}")
+            result = output.getvalue()
+            logger.debug("💾 Сжато: %.1fKB, качество: %s", len(result) / 1024, quality)
+            
+            if cache is not None:
+                cache.put(cache_key, result)
             
-            return output.getvalue()
+            return result
             
     except Exception as e:
-        logger.error(f"❌ Ошибка сжатия {image_path}: {e}")
-        # В случае ошибки читаем оригинал
-        with open(image_path, 'rb') as f:
-            return f.read()
+        logger.error("❌ Ошибка сжатия %s: %s", name, e)
+        # В случае ошибки отдаём оригинал
+        if data is not None:
+            return data
+        return read_source(image)
+
+
+def compress_page(image: ImageSource, mode: str = 'convert', **kwargs) -> bytes:
+    """
+    compress_image с замером времени страницы
+
+    mode - метка метрики: convert (при /convert) или eager (сразу после
+    загрузки). В пуле процессов метрики остаются в дочернем процессе.
+    """
+    with PAGE_COMPRESS_SECONDS.time(mode=mode):
+        result = compress_image(image, **kwargs)
+    PAGES.inc(mode=mode)
+    return result
+
+
+def iter_compressed_images(
+    image_files: List[ImageSource],
+    quality: int = 85,
+    max_size: tuple = None,
+    workers: Optional[int] = None,
+    serial_threshold: int = SERIAL_THRESHOLD,
+    draft: bool = True
+) -> Iterator[bytes]:
+    """
+    Сжимает страницы параллельно и отдаёт их по одной в порядке image_files
+    
+    Pillow отпускает GIL при декодировании, ресайзе и кодировании,
+    поэтому потоки реально загружают все ядра. Вперёд сжимается не больше
+    workers страниц, так что в памяти не копятся все страницы сразу.
+    
+    Args:
+        image_files: изображения (пути или буферы) в порядке страниц
+        quality: качество JPEG (1-100)
+        max_size: максимальные размеры (width, height)
+        workers: число потоков (None = число ядер)
+        serial_threshold: до скольких страниц сжимаем последовательно
+        draft: декодировать большие JPEG в уменьшенном масштабе
+    
+    Yields:
+        bytes: сжатая страница
+    """
+    total = len(image_files)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, total)
+    
+    def process_page(item):
+        i, img_path = item
+        logger.debug("🔄 Обработка %d/%d: %s", i, total, get_source_name(img_path))
+        img_data = compress_page(img_path, quality=quality,
+                                 max_size=max_size, draft=draft)
+        
+        # Логируем прогресс
+        if i % 5 == 0:
+            logger.debug("📊 Прогресс: %d/%d", i, total)
+        return img_data
+    
+    pages = enumerate(image_files, 1)
+    
+    if workers <= 1 or total <= serial_threshold:
+        logger.debug(f"Последовательное сжатие {total} страниц")
+        for page in pages:
+            yield process_page(page)
+        return
+    
+    logger.debug(f"Параллельное сжатие {total} страниц в {workers} потоков")
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix="page") as executor:
+        # Окно из workers задач: отдаём страницы строго по порядку
+        window = deque(executor.submit(process_page, page)
+                       for page in islice(pages, workers))
+        while window:
+            img_data = window.popleft().result()
+            next_page = next(pages, None)
+            if next_page is not None:
+                window.append(executor.submit(process_page, next_page))
+            yield img_data
+
+
+def compress_images(
+    image_files: List[ImageSource],
+    quality: int = 85,
+    max_size: tuple = None,
+    workers: Optional[int] = None,
+    serial_threshold: int = SERIAL_THRESHOLD,
+    draft: bool = True
+) -> List[bytes]:
+    """
+    Сжимает все страницы (см. iter_compressed_images) и возвращает список
+    
+    Returns:
+        List[bytes]: сжатые страницы в порядке image_files
+    """
+    return list(iter_compressed_images(
+        image_files,
+        quality=quality,
+        max_size=max_size,
+        workers=workers,
+        serial_threshold=serial_threshold,
+        draft=draft
+    ))
 
 
 def get_safe_filename_key(filename: str) -> int:
@@ -70,7 +548,7 @@ def get_safe_filename_key(filename: str) -> int:
         return int(key_part)
     except (ValueError, IndexError):
         # Если не удалось - кладём в конец
-        logger.warning(f"⚠️ Нестандартное имя файла: {filename}")
+        logger.warning("⚠️ Нестандартное имя файла: %s", filename)
         return float('inf')
 
 
@@ -81,7 +559,11 @@ def image_converter_to_pdf(
     quality: int = 75,  # По умолчанию 75% - хороший баланс
     max_width: Optional[int] = 1200,  # Ограничиваем ширину
     max_height: Optional[int] = 1800,  # Ограничиваем высоту
-    allowed_extensions: tuple = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff')
+    allowed_extensions: tuple = ALLOWED_EXTENSIONS,
+    workers: Optional[int] = None,  # None = по числу ядер
+    streaming: bool = False,  # Писать PDF постранично, не держа страницы в памяти
+    draft: bool = True,  # Уменьшать большие JPEG ещё при декодировании
+    staged: Optional[Dict[str, bytes]] = None  # Файлы из памяти: имя -> байты
 ) -> Optional[str]:
     """
     Конвертирует изображения в PDF со сжатием
@@ -94,6 +576,13 @@ def image_converter_to_pdf(
         max_width: максимальная ширина (None = без изменений)
         max_height: максимальная высота (None = без изменений)
         allowed_extensions: разрешённые расширения
+        workers: число потоков для сжатия страниц (None = число ядер)
+        streaming: писать каждую страницу в файл сразу после сжатия,
+            иначе собрать все страницы и PDF в памяти через img2pdf
+        draft: декодировать большие JPEG в уменьшенном масштабе
+            (False - максимальная точность)
+        staged: файлы, загруженные в память, а не в input_directory;
+            сортируются вместе с файлами с диска по имени
     
     Returns:
         str: путь к PDF файлу или None при ошибке
@@ -103,37 +592,44 @@ def image_converter_to_pdf(
     logger.info(f"📁 Входная папка: {input_directory}")
     logger.info(f"📁 Выходная папка: {output_directory}")
     
+    staged = staged or {}
+    
     # Проверяем входную папку
-    if not os.path.exists(input_directory):
+    if not os.path.exists(input_directory) and not staged:
         logger.error(f"❌ Папка не существует: {input_directory}")
         return None
     
-    # Собираем все изображения
-    image_files = []
-    all_files = os.listdir(input_directory)
-    logger.info(f"📊 Всего файлов в папке: {len(all_files)}")
+    # Собираем все изображения: с диска и из памяти
+    candidates = []
+    if os.path.exists(input_directory):
+        for fname in os.listdir(input_directory):
+            candidates.append((fname, os.path.join(input_directory, fname)))
+    for fname, data in staged.items():
+        buffer = io.BytesIO(data)
+        buffer.name = fname
+        candidates.append((fname, buffer))
+    logger.info(f"📊 Всего файлов: {len(candidates)} (из памяти: {len(staged)})")
     
-    for fname in all_files:
-        file_path = os.path.join(input_directory, fname)
-        
+    image_files = []
+    for fname, source in candidates:
         # Пропускаем папки
-        if os.path.isdir(file_path):
-            logger.debug(f"📁 Пропущена папка: {fname}")
+        if isinstance(source, str) and os.path.isdir(source):
+            logger.debug("📁 Пропущена папка: %s", fname)
             continue
         
         # Проверяем расширение
         if not fname.lower().endswith(allowed_extensions):
-            logger.debug(f"⏭️ Пропущен неподдерживаемый формат: {fname}")
+            logger.debug("⏭️ Пропущен неподдерживаемый формат: %s", fname)
             continue
         
         # Проверяем размер файла
-        file_size = os.path.getsize(file_path) / 1024  # KB
+        file_size = get_source_size(source) / 1024  # KB
         if file_size > 50 * 1024:  # > 50MB
-            logger.warning(f"⚠️ Слишком большой файл ({file_size:.1f}KB): {fname}")
+            logger.warning("⚠️ Слишком большой файл (%.1fKB): %s", file_size, fname)
             continue
         
-        image_files.append(file_path)
-        logger.debug(f"✅ Добавлен файл: {fname} ({file_size:.1f}KB)")
+        image_files.append(source)
+        logger.debug("✅ Добавлен файл: %s (%.1fKB)", fname, file_size)
     
     # Проверяем, есть ли изображения
     if not image_files:
@@ -144,61 +640,71 @@ def image_converter_to_pdf(
     
     # Сортируем файлы
     try:
-        image_files.sort(key=lambda x: get_safe_filename_key(os.path.basename(x)))
+        image_files.sort(key=lambda x: get_safe_filename_key(get_source_name(x)))
         logger.debug("✅ Файлы отсортированы")
     except Exception as e:
         logger.warning(f"⚠️ Ошибка сортировки: {e}, используем порядок файловой системы")
     
     # Сжимаем и конвертируем изображения
-    compressed_images = []
     max_size = (max_width, max_height) if max_width and max_height else None
-    
-    for i, img_path in enumerate(image_files, 1):
-        logger.info(f"🔄 Обработка {i}/{len(image_files)}: {os.path.basename(img_path)}")
-        
-        # Сжимаем изображение
-        img_data = compress_image(
-            img_path, 
-            quality=quality,
-            max_size=max_size
-        )
-        compressed_images.append(img_data)
-        
-        # Логируем прогресс
-        if i % 5 == 0:
-            logger.info(f"📊 Прогресс: {i}/{len(image_files)}")
+    pages = iter_compressed_images(
+        image_files,
+        quality=quality,
+        max_size=max_size,
+        workers=workers,
+        draft=draft
+    )
     
     # Создаём PDF
     output_filename = f"result_{message_id}.pdf"
     output_path = os.path.join(output_directory, output_filename)
+    # Без дат создания PDF зависит только от страниц: по его хэшу
+    # можно повторно отправлять уже загруженный в Telegram файл
+    metadata = dict(
+        title="Converted by PDFConverter",
+        author="Telegram Bot",
+        creator="PDFConverter Bot",
+        nodate=True
+    )
     
     try:
         logger.info(f"📄 Создание PDF: {output_path}")
         
-        # Конвертируем в PDF
-        pdf_bytes = img2pdf.convert(
-            compressed_images,
-            title=f"Converted by PDFConverter",
-            author="Telegram Bot",
-            creator="PDFConverter Bot"
-        )
-        
-        # Сохраняем PDF
-        with open(output_path, "wb") as f:
-            f.write(pdf_bytes)
+        if streaming:
+            # Пишем во временный файл, чтобы недописанный PDF
+            # не был принят за результат
+            partial_path = output_path + ".part"
+            try:
+                with open(partial_path, "wb") as f, \
+                        StreamingPdfWriter(f, **metadata) as writer:
+                    for img_data in pages:
+                        writer.add_jpeg(ensure_jpeg(img_data, quality))
+                os.replace(partial_path, output_path)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+        else:
+            # Конвертируем в PDF
+            pdf_bytes = img2pdf.convert(list(pages), **metadata)
+            
+            # Сохраняем PDF
+            with open(output_path, "wb") as f:
+                f.write(pdf_bytes)
         
         # Проверяем результат
         if os.path.exists(output_path):
             pdf_size = os.path.getsize(output_path) / 1024
             logger.info(f"✅ PDF создан успешно!")
             logger.info(f"📊 Размер PDF: {pdf_size:.1f}KB")
-            logger.info(f"📄 Страниц: {len(compressed_images)}")
+            logger.info(f"📄 Страниц: {len(image_files)}")
             
             # Сравниваем с оригиналом (примерно)
-            original_size = sum(os.path.getsize(f) for f in image_files) / 1024
+            original_size = sum(get_source_size(f) for f in image_files) / 1024
             compression_ratio = (pdf_size / original_size * 100) if original_size > 0 else 0
             logger.info(f"💾 Сжатие: {original_size:.1f}KB → {pdf_size:.1f}KB "
                        f"({compression_ratio:.1f}%)")
+            if page_cache is not None:
+                logger.info(f"♻️ Кэш страниц: {page_cache.stats()}")
             
             return output_path
         else:
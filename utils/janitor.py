@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+from typing import List, Optional, Tuple
+
+from core.core import (JANITOR_GRACE_PERIOD, JANITOR_INTERVAL, TEMP_MAX_AGE,
+                       TEMP_MAX_TOTAL_BYTES)
+from core.logger import setup_logger
+from utils.delivery import job_delivery
+from utils.eager_compression import eager_compressor
+from utils.image_converter import page_cache
+from utils.job_scheduler import job_scheduler
+from utils.memory_staging import memory_staging
+from utils.pending_downloads import pending_downloads
+from utils.temp_buffer import LocalDirStorage, storage
+
+logger = setup_logger(__name__)
+
+
+class TempJanitor:
+    """
+    Фоновая уборка брошенных временных папок пользователей
+
+    Папка удаляется, если в ней давно ничего не менялось (max_age),
+    либо, если все папки вместе больше max_total_bytes, - начиная
+    с самых давно активных (LRU). Папки, которые менялись последние
+    grace_period секунд или ждут загрузок, не трогаем. Загрузка в
+    память (memory_staging) тоже считается активностью: папка на диске
+    при этом не меняется.
+    """
+
+    def __init__(
+        self,
+        temp_storage: LocalDirStorage,
+        interval: float,
+        max_age: float,
+        max_total_bytes: int,
+        grace_period: float,
+    ):
+        self.storage = temp_storage
+        self.interval = interval
+        self.max_age = max_age
+        self.max_total_bytes = max_total_bytes
+        self.grace_period = grace_period
+        self.bytes_reclaimed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _memory_activity(user: str) -> Optional[float]:
+        if memory_staging is None or not user.isdigit():
+            return None
+        return memory_staging.last_activity(int(user))
+
+    def _scan_user(self, user: str) -> Tuple[float, int]:
+        """Время последней активности (диск и память) и размер папки пользователя."""
+        user_dir = self.storage.get_user_dir(user)
+        last_activity = max(os.path.getmtime(user_dir),
+                            self._memory_activity(user) or 0)
+        total = 0
+        for root, dirs, files in os.walk(user_dir):
+            for name in dirs + files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue  # Удалён во время обхода
+                last_activity = max(last_activity, stat.st_mtime)
+                if name in files:
+                    total += stat.st_size
+        return last_activity, total
+
+    def _is_busy(self, user: str) -> bool:
+        if not user.isdigit():
+            return False
+        user_id = int(user)
+        # Загрузка в память могла случиться уже после сканирования папки
+        memory_activity = self._memory_activity(user)
+        if memory_activity is not None and time.time() - memory_activity < self.grace_period:
+            return True
+        return (pending_downloads.count(user_id) > 0
+                or (eager_compressor is not None and eager_compressor.count(user_id) > 0)
+                or job_scheduler.is_busy(user_id)
+                or job_delivery.is_pending(user_id))
+
+    def _evict(self, user: str) -> int:
+        freed = self.storage.remove_user(user)
+        if memory_staging is not None and user.isdigit():
+            # Иначе в PDF попали бы только файлы из памяти
+            memory_staging.clear(int(user))
+        return freed
+
+    def sweep(self) -> int:
+        """
+        Один проход уборки
+
+        Returns:
+            int: сколько байт освобождено
+        """
+        now = time.time()
+        users: List[Tuple[float, int, str]] = []
+        for user in self.storage.list_users():
+            try:
+                last_activity, size = self._scan_user(user)
+            except OSError:
+                continue
+            users.append((last_activity, size, user))
+
+        total = sum(size for _, size, _ in users)
+        reclaimed = 0
+        evicted = 0
+        # От самых давно активных к недавним
+        for last_activity, size, user in sorted(users):
+            age = now - last_activity
+            if age < self.grace_period or self._is_busy(user):
+                continue
+            # Ради лимита объёма пустые папки удалять бесполезно
+            if age > self.max_age or (total > self.max_total_bytes and size > 0):
+                self._evict(user)
+                total -= size
+                reclaimed += size
+                evicted += 1
+                logger.debug(f"Удалена папка пользователя {user}: "
+                             f"{size} bytes, без активности {age:.0f} сек")
+
+        if page_cache is not None:
+            page_cache.evict_expired()
+
+        self.bytes_reclaimed += reclaimed
+        logger.info(f"Уборка temp: удалено папок {evicted}, освобождено "
+                    f"{reclaimed / 1024:.1f}KB, осталось {total / 1024:.1f}KB")
+        return reclaimed
+
+    async def run(self) -> None:
+        """Бесконечный цикл уборки с интервалом interval."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Ошибка уборки temp: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"Уборка temp запущена, интервал {self.interval} сек")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+janitor = TempJanitor(
+    storage,
+    interval=JANITOR_INTERVAL,
+    max_age=TEMP_MAX_AGE,
+    max_total_bytes=TEMP_MAX_TOTAL_BYTES,
+    grace_period=JANITOR_GRACE_PERIOD,
+)
@@ -0,0 +1,109 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.constants import MANIFEST_NAME
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def get_manifest_path(path_in: str) -> str:
+    """Манифест лежит рядом с папками IN/OUT пользователя."""
+    return (Path(path_in).parent / MANIFEST_NAME).as_posix()
+
+
+def collect_inputs(
+    path_in: str,
+    staged: Optional[Dict[str, bytes]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Снимок входных файлов: имя, размер и время изменения
+
+    Файлы из памяти (staged) описываются именем и размером: имя уже
+    содержит message_id и при повторной загрузке меняется.
+    """
+    inputs = [
+        {"name": name, "size": len(data), "mtime_ns": None}
+        for name, data in sorted((staged or {}).items())
+    ]
+    for entry in sorted(os.scandir(path_in), key=lambda e: e.name):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        inputs.append({
+            "name": entry.name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        })
+    return inputs
+
+
+def save_manifest(
+    path_in: str,
+    inputs: List[Dict[str, Any]],
+    pdf_path: str,
+    settings: Dict[str, Any],
+) -> None:
+    """Записать манифест готовой задачи."""
+    manifest = {
+        "inputs": inputs,
+        "settings": settings,
+        "pdf_path": pdf_path,
+        "pdf_size": os.path.getsize(pdf_path),
+    }
+    manifest_path = get_manifest_path(path_in)
+    tmp_path = manifest_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+        logger.debug(f"Манифест сохранён: {manifest_path}")
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить манифест {manifest_path}: {e}")
+
+
+def load_manifest(path_in: str) -> Optional[Dict[str, Any]]:
+    """Прочитать манифест, None если его нет или он битый."""
+    manifest_path = get_manifest_path(path_in)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось прочитать манифест {manifest_path}: {e}")
+        return None
+
+
+def find_reusable_pdf(
+    path_in: str,
+    inputs: List[Dict[str, Any]],
+    settings: Dict[str, Any],
+) -> Optional[str]:
+    """
+    Вернуть путь к уже готовому PDF, если входные файлы и настройки
+    не изменились с прошлой конвертации.
+    """
+    manifest = load_manifest(path_in)
+    if manifest is None:
+        return None
+    if manifest.get("inputs") != inputs or manifest.get("settings") != settings:
+        logger.debug("Манифест устарел: входные файлы или настройки изменились")
+        return None
+
+    pdf_path = manifest.get("pdf_path")
+    if not pdf_path or not os.path.exists(pdf_path):
+        return None
+    if os.path.getsize(pdf_path) != manifest.get("pdf_size"):
+        logger.warning(f"Размер {pdf_path} не совпадает с манифестом")
+        return None
+    return pdf_path
+
+
+def delete_manifest(path_in: str) -> None:
+    """Удалить манифест пользователя, если он есть."""
+    manifest_path = get_manifest_path(path_in)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
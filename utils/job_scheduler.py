@@ -0,0 +1,177 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from core.core import (SCHEDULER_MAX_ACTIVE, SCHEDULER_MAX_QUEUE,
+                       SCHEDULER_PREMIUM_WEIGHT)
+from core.logger import setup_logger
+from utils.metrics import JOBS_IN_FLIGHT, JOBS_QUEUED
+
+logger = setup_logger(__name__)
+
+PREMIUM = 'premium'
+REGULAR = 'regular'
+
+
+class QueueFull(Exception):
+    """Очередь конвертаций переполнена."""
+
+
+class JobTicket:
+    """Место пользователя в очереди конвертаций."""
+
+    def __init__(self, user_id: int, lane: str):
+        self.user_id = user_id
+        self.lane = lane
+        self.coalesced = False
+        self._started = asyncio.get_running_loop().create_future()
+
+    @property
+    def started(self) -> bool:
+        return self._started.done()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться запуска. False - если за timeout очередь не дошла."""
+        try:
+            await asyncio.wait_for(asyncio.shield(self._started), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class JobScheduler:
+    """
+    Очередь конвертаций со справедливым распределением
+
+    - у пользователя не больше одной активной задачи, поэтому две
+      команды /convert не работают одновременно с одной папкой;
+    - повторная команда, пока задача ещё в очереди, не создаёт новую,
+      а получает уже существующее место (coalesced);
+    - пользователи обслуживаются по кругу: у каждого в очереди не
+      больше одной задачи, и очередь тяжёлого пользователя не мешает
+      остальным;
+    - две полосы: премиум получает weight запусков на один обычный,
+      но обычная полоса не простаивает бесконечно.
+    """
+
+    def __init__(self, max_active: int, premium_weight: int = 3,
+                 max_queue: int = 200):
+        self.max_active = max_active
+        self.premium_weight = max(1, premium_weight)
+        self.max_queue = max_queue
+        self._lanes: Dict[str, Deque[JobTicket]] = {
+            PREMIUM: deque(),
+            REGULAR: deque(),
+        }
+        self._queued: Dict[int, JobTicket] = {}
+        self._active: Dict[int, JobTicket] = {}
+        # Сколько премиум-задач запущено подряд
+        self._premium_streak = 0
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    @property
+    def queued_count(self) -> int:
+        return len(self._queued)
+
+    def is_busy(self, user_id: int) -> bool:
+        """Есть ли у пользователя задача в работе или в очереди."""
+        return user_id in self._active or user_id in self._queued
+
+    def enqueue(self, user_id: int, premium: bool = False) -> JobTicket:
+        """
+        Поставить задачу пользователя в очередь
+
+        Если задача пользователя уже ждёт в очереди, возвращается её
+        билет с coalesced=True - запускать вторую конвертацию не нужно.
+
+        Raises:
+            QueueFull: в очереди уже max_queue задач
+        """
+        existing = self._queued.get(user_id)
+        if existing is not None:
+            existing.coalesced = True
+            return existing
+        if len(self._queued) >= self.max_queue:
+            raise QueueFull(f"В очереди уже {len(self._queued)} задач")
+
+        ticket = JobTicket(user_id, PREMIUM if premium else REGULAR)
+        self._queued[user_id] = ticket
+        self._lanes[ticket.lane].append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: JobTicket) -> int:
+        """Номер в очереди (1 - следующий), 0 - задача уже запущена."""
+        if ticket.started:
+            return 0
+        for index, queued in enumerate(self._dispatch_order(), start=1):
+            if queued is ticket:
+                return index
+        return 0
+
+    def release(self, ticket: JobTicket) -> None:
+        """Освободить место: задача завершилась или ожидание отменено."""
+        if self._active.get(ticket.user_id) is ticket:
+            del self._active[ticket.user_id]
+        elif self._queued.get(ticket.user_id) is ticket:
+            del self._queued[ticket.user_id]
+            self._lanes[ticket.lane].remove(ticket)
+        self._dispatch()
+
+    def _eligible(self, lane: str) -> Optional[JobTicket]:
+        """Первая задача полосы, у пользователя которой нет активной задачи."""
+        for ticket in self._lanes[lane]:
+            if ticket.user_id not in self._active:
+                return ticket
+        return None
+
+    def _pick(self, premium: Optional[JobTicket],
+              regular: Optional[JobTicket], streak: int) -> Optional[str]:
+        if premium is not None and (regular is None or streak < self.premium_weight):
+            return PREMIUM
+        if regular is not None:
+            return REGULAR
+        return None
+
+    def _dispatch(self) -> None:
+        """Запустить задачи, пока есть свободные места."""
+        while len(self._active) < self.max_active:
+            premium = self._eligible(PREMIUM)
+            regular = self._eligible(REGULAR)
+            lane = self._pick(premium, regular, self._premium_streak)
+            if lane is None:
+                return
+            ticket = premium if lane == PREMIUM else regular
+            self._premium_streak = self._premium_streak + 1 if lane == PREMIUM else 0
+
+            self._lanes[lane].remove(ticket)
+            del self._queued[ticket.user_id]
+            self._active[ticket.user_id] = ticket
+            ticket._started.set_result(None)
+            logger.debug(f"Запущена задача пользователя {ticket.user_id} ({lane}), "
+                         f"активных: {len(self._active)}, в очереди: {len(self._queued)}")
+
+    def _dispatch_order(self) -> List[JobTicket]:
+        """Порядок, в котором будут запущены задачи из очереди сейчас."""
+        lanes = {lane: list(queue) for lane, queue in self._lanes.items()}
+        streak = self._premium_streak
+        order = []
+        while lanes[PREMIUM] or lanes[REGULAR]:
+            premium = lanes[PREMIUM][0] if lanes[PREMIUM] else None
+            regular = lanes[REGULAR][0] if lanes[REGULAR] else None
+            lane = self._pick(premium, regular, streak)
+            streak = streak + 1 if lane == PREMIUM else 0
+            order.append(lanes[lane].pop(0))
+        return order
+
+
+job_scheduler = JobScheduler(
+    max_active=SCHEDULER_MAX_ACTIVE,
+    premium_weight=SCHEDULER_PREMIUM_WEIGHT,
+    max_queue=SCHEDULER_MAX_QUEUE,
+)
+JOBS_IN_FLIGHT.set_function(lambda: job_scheduler.active_count)
+JOBS_QUEUED.set_function(lambda: job_scheduler.queued_count)
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from core.core import (MEMORY_STAGING, MEMORY_STAGING_MAX_FILE_BYTES,
+                       MEMORY_STAGING_TOTAL_BYTES, MEMORY_STAGING_USER_BYTES)
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class MemoryStagingStore:
+    """
+    Загруженные файлы пользователей в памяти, без записи в папку IN
+
+    Объём ограничен на пользователя и суммарно. Если файл больше порога
+    или лимиты исчерпаны, put() возвращает False и вызывающий код
+    сохраняет файл на диск как раньше.
+
+    Методы потокобезопасны: уборка temp (TempJanitor) работает в потоке.
+    Время последней загрузки пользователя - его активность для уборки,
+    ведь папка на диске при загрузке в память не меняется.
+    """
+
+    def __init__(self, max_bytes_per_user: int, max_total_bytes: int,
+                 max_file_bytes: int):
+        self.max_bytes_per_user = max_bytes_per_user
+        self.max_total_bytes = max_total_bytes
+        self.max_file_bytes = max_file_bytes
+        self._files: Dict[int, Dict[str, bytes]] = defaultdict(dict)
+        self._user_bytes: Dict[int, int] = defaultdict(int)
+        self._total_bytes = 0
+        self._last_put: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def accepts(self, size: Optional[int]) -> bool:
+        """Стоит ли вообще пробовать держать файл такого размера в памяти."""
+        return size is not None and size <= self.max_file_bytes
+
+    def put(self, user_id: int, name: str, data: bytes) -> bool:
+        """
+        Положить файл в память
+
+        Returns:
+            bool: False - не хватает места, файл нужно сохранить на диск
+        """
+        size = len(data)
+        with self._lock:
+            if (size > self.max_file_bytes
+                    or self._user_bytes[user_id] + size > self.max_bytes_per_user
+                    or self._total_bytes + size > self.max_total_bytes):
+                logger.debug(f"Нет места в памяти для {name} ({size} bytes), "
+                             f"сохраняем на диск")
+                return False
+
+            previous = self._files[user_id].get(name)
+            if previous is not None:
+                self._user_bytes[user_id] -= len(previous)
+                self._total_bytes -= len(previous)
+            self._files[user_id][name] = data
+            self._user_bytes[user_id] += size
+            self._total_bytes += size
+            self._last_put[user_id] = time.time()
+            return True
+
+    def items(self, user_id: int) -> Dict[str, bytes]:
+        """Копия словаря имя -> байты для конвертации."""
+        with self._lock:
+            return dict(self._files.get(user_id, {}))
+
+    def count(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._files.get(user_id, {}))
+
+    def usage(self, user_id: int) -> int:
+        with self._lock:
+            return self._user_bytes.get(user_id, 0)
+
+    def last_activity(self, user_id: int) -> Optional[float]:
+        """Время последней загрузки в память (None - файлов в памяти нет)."""
+        with self._lock:
+            return self._last_put.get(user_id)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def clear(self, user_id: int) -> None:
+        """Забыть все файлы пользователя."""
+        with self._lock:
+            self._clear(user_id)
+
+    def _clear(self, user_id: int) -> None:
+        self._files.pop(user_id, None)
+        self._last_put.pop(user_id, None)
+        self._total_bytes -= self._user_bytes.pop(user_id, 0)
+
+    def spill(self, user_id: int, directory: str) -> int:
+        """
+        Сбросить файлы пользователя из памяти в папку на диске
+
+        Returns:
+            int: сколько файлов записано
+        """
+        with self._lock:
+            files = self._files.get(user_id, {})
+            for name, data in files.items():
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(data)
+            count = len(files)
+            self._clear(user_id)
+        return count
+
+
+# MEMORY_STAGING=false - все загрузки сразу идут на диск
+memory_staging = (MemoryStagingStore(MEMORY_STAGING_USER_BYTES,
+                                     MEMORY_STAGING_TOTAL_BYTES,
+                                     MEMORY_STAGING_MAX_FILE_BYTES)
+                  if MEMORY_STAGING else None)
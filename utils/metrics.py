@@ -0,0 +1,320 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from core.core import METRICS_HOST, METRICS_PORT
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PREFIX = 'pdfconverter_'
+
+# Секунды: от быстрых запросов к БД до долгих конвертаций
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                   10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues,
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовая метрика с метками. Обновления потокобезопасны."""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: ожидались метки {self.labelnames}, '
+                             f'получены {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик (скорость считается через rate())."""
+
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if not values and not self.labelnames:
+            values[()] = 0
+        return [f'{self.name}_total{_format_labels(self.labelnames, key)} '
+                f'{_format_value(value)}' for key, value in values.items()]
+
+
+class Gauge(Metric):
+    """Текущее значение: задаётся явно или вычисляется при сборе."""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Брать значение из function в момент сбора (только без меток)."""
+        self._function = function
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f'{self.name} {_format_value(self._function())}']
+        with self._lock:
+            values = dict(self._values)
+        if not values and not self.labelnames:
+            values[()] = 0
+        return [f'{self.name}{_format_labels(self.labelnames, key)} '
+                f'{_format_value(value)}' for key, value in values.items()]
+
+
+class Histogram(Metric):
+    """Распределение длительностей (или размеров) по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # метки -> (счётчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Замерить длительность блока with (в том числе при исключении)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(state[0]), state[1], state[2])
+                      for key, state in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Загрузка файлов пользователя
+DOWNLOAD_SECONDS = registry.histogram(
+    'download_seconds', 'Скачивание файла из Telegram', ['target'])
+DOWNLOAD_BYTES = registry.counter(
+    'download_bytes', 'Скачано байт из Telegram')
+
+# Этапы /convert
+DOWNLOAD_WAIT_SECONDS = registry.histogram(
+    'download_wait_seconds', 'Ожидание незавершённых загрузок перед конвертацией')
+QUEUE_WAIT_SECONDS = registry.histogram(
+    'queue_wait_seconds', 'Ожидание в очереди конвертаций')
+DB_SECONDS = registry.histogram(
+    'db_seconds', 'Запросы к БД', ['operation'])
+PAGE_COMPRESS_SECONDS = registry.histogram(
+    'page_compress_seconds', 'Сжатие одной страницы', ['mode'])
+PAGES = registry.counter(
+    'pages', 'Сжато страниц', ['mode'])
+PAGE_CACHE_HITS = registry.counter(
+    'page_cache_hits', 'Страницы, найденные в кэше')
+PAGE_CACHE_MISSES = registry.counter(
+    'page_cache_misses', 'Страницы, которых не было в кэше')
+PAGE_CACHE_EVICTIONS = registry.counter(
+    'page_cache_evictions', 'Страницы, вытесненные из кэша')
+PAGE_CACHE_BYTES = registry.gauge(
+    'page_cache_bytes', 'Объём кэша страниц по индексу процесса')
+ASSEMBLY_SECONDS = registry.histogram(
+    'assembly_seconds', 'Сборка PDF (сжатие всех страниц и запись)')
+PDF_BYTES = registry.counter(
+    'pdf_bytes', 'Байт в готовых PDF')
+UPLOAD_SECONDS = registry.histogram(
+    'upload_seconds', 'Отправка PDF пользователю', ['method'])
+UPLOAD_RETRIES = registry.counter(
+    'upload_retries', 'Неудачные попытки отправки PDF', ['reason'])
+FLOOD_WAITS = registry.counter(
+    'flood_waits', 'Ответы Telegram Flood control (RetryAfter)')
+FLOOD_WAIT_SECONDS = registry.counter(
+    'flood_wait_seconds', 'Суммарное ожидание по Flood control, сек')
+JOB_SECONDS = registry.histogram(
+    'job_seconds', 'Полное время /convert', ['result'])
+JOBS = registry.counter(
+    'jobs', 'Завершённые /convert', ['result'])
+JOBS_IN_FLIGHT = registry.gauge(
+    'jobs_in_flight', 'Выполняющиеся конвертации')
+JOBS_QUEUED = registry.gauge(
+    'jobs_queued', 'Конвертации в очереди')
+
+# Запись статистики
+STATS_WRITE_SECONDS = registry.histogram(
+    'stats_write_seconds', 'Пакетная запись статистики в БД')
+STATS_ROWS = registry.counter(
+    'stats_rows', 'Строк статистики', ['result'])
+STATS_PENDING = registry.gauge(
+    'stats_pending', 'Строк статистики, ожидающих записи')
+
+
+# Webhook
+WEBHOOK_UPDATES_IN_FLIGHT = registry.gauge(
+    'webhook_updates_in_flight', 'Обновления webhook в обработке')
+WEBHOOK_REJECTED = registry.counter(
+    'webhook_rejected', 'Обновления, отклонённые из-за лимита (503)')
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в процессе бота или воркера."""
+
+    def __init__(self, metrics: MetricsRegistry, host: str, port: int):
+        self.registry = metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self) -> None:
+        """Запустить сервер (port=0 - метрики отключены)."""
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer(registry, METRICS_HOST, METRICS_PORT)
@@ -0,0 +1,202 @@
+import io
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, List, Optional
+
+from PIL import Image
+
+# Без DPI в заголовке img2pdf считает изображение 96 DPI — делаем так же
+DEFAULT_DPI = 96.0
+
+COLOR_SPACES = {
+    'L': '/DeviceGray',
+    'RGB': '/DeviceRGB',
+    'CMYK': '/DeviceCMYK',
+}
+
+
+def _pdf_string(value: str) -> bytes:
+    """Строковый литерал PDF с экранированием спецсимволов."""
+    escaped = (value.replace('\\', '\\\\')
+                    .replace('(', '\\(')
+                    .replace(')', '\\)'))
+    return b'(' + escaped.encode('latin-1', errors='replace') + b')'
+
+
+def _pdf_number(value: float) -> bytes:
+    return f'{value:.4f}'.encode('ascii')
+
+
+class StreamingPdfWriter:
+    """
+    Постраничная запись PDF из JPEG-страниц прямо в файл
+
+    Каждая страница (XObject изображения, поток содержимого и сама
+    страница) пишется сразу при добавлении, в памяти остаются только
+    смещения объектов. Дерево страниц, xref и trailer пишутся в close().
+    JPEG встраивается как есть через /DCTDecode, как это делает img2pdf.
+
+    Пример:
+        with StreamingPdfWriter(open(path, 'wb'), title='...') as writer:
+            for page in pages:
+                writer.add_jpeg(page)
+    """
+
+    # Номера объектов, которые пишутся в конце
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    INFO_ID = 3
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        creator: Optional[str] = None,
+        nodate: bool = False
+    ):
+        self._stream = stream
+        self._metadata = {
+            'Title': title,
+            'Author': author,
+            'Creator': creator,
+        }
+        # Без дат одинаковые страницы дают побайтно одинаковый PDF
+        self._nodate = nodate
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = self.INFO_ID + 1
+        self._position = 0
+        self._closed = False
+        self._write(b'%PDF-1.3\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self._position += len(data)
+
+    def _allocate_id(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id: int, body: bytes,
+                      stream_data: Optional[bytes] = None) -> None:
+        self._offsets[obj_id] = self._position
+        self._write(f'{obj_id} 0 obj\n'.encode('ascii'))
+        self._write(body)
+        if stream_data is not None:
+            self._write(b'\nstream\n')
+            self._write(stream_data)
+            self._write(b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def add_jpeg(self, data: bytes) -> None:
+        """
+        Добавить страницу из JPEG-байтов
+
+        Читается только заголовок изображения, пиксели не декодируются.
+
+        Raises:
+            ValueError: данные не являются JPEG или режим не поддерживается
+        """
+        if self._closed:
+            raise ValueError('PDF уже закрыт')
+
+        with Image.open(io.BytesIO(data)) as img:
+            if img.format != 'JPEG':
+                raise ValueError(f'Ожидался JPEG, получен {img.format}')
+            if img.mode not in COLOR_SPACES:
+                raise ValueError(f'Неподдерживаемый режим JPEG: {img.mode}')
+            width, height = img.size
+            mode = img.mode
+            dpi = img.info.get('dpi')
+            # Adobe-JPEG в CMYK хранит инвертированные значения
+            inverted = mode == 'CMYK' and 'adobe' in img.info
+
+        dpi_x, dpi_y = dpi if dpi else (DEFAULT_DPI, DEFAULT_DPI)
+        if not dpi_x or dpi_x <= 1 or not dpi_y or dpi_y <= 1:
+            dpi_x = dpi_y = DEFAULT_DPI
+        page_width = width * 72.0 / dpi_x
+        page_height = height * 72.0 / dpi_y
+
+        image_id = self._allocate_id()
+        content_id = self._allocate_id()
+        page_id = self._allocate_id()
+
+        image_dict = (
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {COLOR_SPACES[mode]} /BitsPerComponent 8 '
+            f'/Filter /DCTDecode '
+        ).encode('ascii')
+        if inverted:
+            image_dict += b'/Decode [1 0 1 0 1 0 1 0] '
+        image_dict += f'/Length {len(data)} >>'.encode('ascii')
+        self._write_object(image_id, image_dict, data)
+
+        content = (b'q\n' + _pdf_number(page_width) + b' 0 0 '
+                   + _pdf_number(page_height) + b' 0.0000 0.0000 cm\n/Im0 Do\nQ')
+        self._write_object(
+            content_id,
+            f'<< /Length {len(content)} >>'.encode('ascii'),
+            content)
+
+        page = (
+            b'<< /Type /Page /Parent ' + f'{self.PAGES_ID} 0 R'.encode('ascii')
+            + b' /MediaBox [0 0 ' + _pdf_number(page_width) + b' '
+            + _pdf_number(page_height) + b']'
+            + f' /Resources << /XObject << /Im0 {image_id} 0 R >> >>'
+              f' /Contents {content_id} 0 R >>'.encode('ascii')
+        )
+        self._write_object(page_id, page)
+        self._page_ids.append(page_id)
+
+    def close(self) -> None:
+        """Дописать дерево страниц, метаданные, xref и trailer."""
+        if self._closed:
+            return
+        if not self._page_ids:
+            raise ValueError('PDF без страниц')
+
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>'
+            .encode('ascii'))
+        self._write_object(
+            self.CATALOG_ID,
+            f'<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>'.encode('ascii'))
+
+        info = [b'<<']
+        for key, value in self._metadata.items():
+            if value:
+                info.append(f' /{key} '.encode('ascii') + _pdf_string(value))
+        if not self._nodate:
+            now = datetime.now(timezone.utc).strftime('D:%Y%m%d%H%M%SZ')
+            info.append(b' /CreationDate ' + _pdf_string(now))
+            info.append(b' /ModDate ' + _pdf_string(now))
+        info.append(b' >>')
+        self._write_object(self.INFO_ID, b''.join(info))
+
+        xref_offset = self._position
+        size = self._next_id
+        self._write(f'xref\n0 {size}\n'.encode('ascii'))
+        self._write(b'0000000000 65535 f \n')
+        for obj_id in range(1, size):
+            self._write(f'{self._offsets[obj_id]:010d} 00000 n \n'.encode('ascii'))
+        self._write(
+            f'trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R '
+            f'/Info {self.INFO_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'
+            .encode('ascii'))
+        self._stream.flush()
+        self._closed = True
+
+    def __enter__(self) -> 'StreamingPdfWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # При ошибке незавершённый PDF не дописываем
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,74 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Set
+
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PendingDownloads:
+    """
+    Реестр незавершённых загрузок по пользователям
+
+    media_handler регистрирует каждую загрузку, а /convert ждёт ровно их,
+    вместо фиксированной паузы перед конвертацией.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, Set[asyncio.Future]] = defaultdict(set)
+
+    def add(self, user_id: int, future: asyncio.Future) -> None:
+        """Зарегистрировать задачу пользователя до её завершения."""
+        pending = self._pending[user_id]
+        pending.add(future)
+
+        def _forget(done: asyncio.Future) -> None:
+            pending.discard(done)
+            if not pending and self._pending.get(user_id) is pending:
+                del self._pending[user_id]
+
+        future.add_done_callback(_forget)
+
+    def begin(self, user_id: int) -> asyncio.Future:
+        """
+        Отметить начало загрузки
+
+        Вызывать до первого await в обработчике, а по окончании
+        загрузки (успешной или нет) вызвать finish().
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.add(user_id, future)
+        return future
+
+    @staticmethod
+    def finish(future: asyncio.Future) -> None:
+        """Отметить окончание загрузки."""
+        if not future.done():
+            future.set_result(None)
+
+    def count(self, user_id: int) -> int:
+        """Сколько загрузок пользователя ещё не завершено."""
+        return len(self._pending.get(user_id, ()))
+
+    async def wait(self, user_id: int, timeout: float) -> bool:
+        """
+        Дождаться всех текущих загрузок пользователя
+
+        Returns:
+            bool: True - всё загружено, False - истёк таймаут
+        """
+        futures = set(self._pending.get(user_id, ()))
+        if not futures:
+            return True
+
+        logger.debug(f"Ожидание {len(futures)} загрузок пользователя {user_id}")
+        _, not_done = await asyncio.wait(futures, timeout=timeout)
+        if not_done:
+            logger.warning(f"Не дождались {len(not_done)} загрузок "
+                           f"пользователя {user_id} за {timeout} сек")
+            return False
+        return True
+
+
+pending_downloads = PendingDownloads()
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.core import (STATS_BATCH_SIZE, STATS_FLUSH_INTERVAL,
+                       STATS_MAX_PENDING, STATS_MAX_RETRIES)
+from core.logger import setup_logger
+from crud.base import CRUDBase
+from crud.converting import crud_convert
+from database.engine import AsyncSessionLocal
+from utils.metrics import STATS_PENDING, STATS_ROWS, STATS_WRITE_SECONDS
+
+logger = setup_logger(__name__)
+
+
+class StatsRecorder:
+    """
+    Отложенная пакетная запись статистики конвертаций
+
+    record() только кладёт строку в очередь в памяти, а фоновая задача
+    пишет накопленное одним пакетным INSERT - каждые batch_size
+    строк или раз в flush_interval секунд, и ещё раз при остановке.
+    Ошибка БД не затрагивает пользователя: строки вернутся в очередь
+    и запишутся при следующей попытке. После max_retries неудач подряд
+    пакет отбрасывается (строки остаются в логе), чтобы одна
+    «отравленная» строка не блокировала запись навсегда.
+    """
+
+    def __init__(
+        self,
+        repository: CRUDBase,
+        session_factory: Callable[[], AsyncSession],
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        max_retries: int = 5,
+    ):
+        self.repository = repository
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.dropped = 0
+        self._failures = 0
+        self._stopping = False
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_needed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(self, data: Dict[str, Any]) -> None:
+        """Поставить строку в очередь на запись."""
+        row = dict(data)
+        # Время фиксируем сейчас, а не в момент записи в БД
+        row.setdefault("converted_at", datetime.now())
+        self._pending.append(row)
+        self._trim()
+        if len(self._pending) >= self.batch_size:
+            self._flush_needed.set()
+
+    def _trim(self) -> None:
+        """Если БД долго недоступна, отбрасываем самые старые строки."""
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+            STATS_ROWS.inc(overflow, result='dropped')
+            logger.warning(f"Очередь статистики переполнена, отброшено {overflow} строк")
+
+    async def flush(self) -> int:
+        """Записать всё накопленное. Возвращает число записанных строк."""
+        if not self._pending:
+            return 0
+        rows, self._pending = self._pending, []
+        try:
+            with STATS_WRITE_SECONDS.time():
+                async with self.session_factory() as session:
+                    written = await self.repository.create_many(session, rows)
+            STATS_ROWS.inc(written, result='written')
+            logger.debug(f"Записано строк статистики: {written}")
+            self._failures = 0
+            return written
+        except Exception as e:
+            self._failures += 1
+            logger.error(f"Не удалось записать статистику ({len(rows)} строк, "
+                         f"попытка {self._failures}/{self.max_retries}): {e}")
+            STATS_ROWS.inc(len(rows), result='failed')
+            if self._failures >= self.max_retries:
+                self._failures = 0
+                self.dropped += len(rows)
+                STATS_ROWS.inc(len(rows), result='dropped')
+                logger.error(f"Пакет статистики отброшен: {rows}")
+                return 0
+            # Возвращаем в начало очереди, новые строки идут после
+            self._pending = rows + self._pending
+            self._trim()
+            return 0
+
+    async def run(self) -> None:
+        """Фоновый цикл: запись по размеру пакета или по таймеру до stop()."""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(),
+                                       timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Остановить фоновую задачу и дописать остаток
+
+        Задачу не отменяем: идущая запись уже забрала строки из очереди
+        и при отмене они бы потерялись. Дожидаемся её и пишем остаток.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._flush_needed.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+stats_recorder = StatsRecorder(
+    crud_convert,
+    AsyncSessionLocal,
+    batch_size=STATS_BATCH_SIZE,
+    flush_interval=STATS_FLUSH_INTERVAL,
+    max_pending=STATS_MAX_PENDING,
+    max_retries=STATS_MAX_RETRIES,
+)
+STATS_PENDING.set_function(lambda: stats_recorder.pending)
@@ -1,30 +1,205 @@
 import os
+import shutil
+import threading
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from core.constants import INPUT_PATH_NAME, OUTPUT_PATH_NAME
+from core.core import TEMP_ROOT, TEMP_STORAGE_BACKEND, TEMP_USER_QUOTA_BYTES
 from core.logger import setup_logger
 
 logger = setup_logger(name='temp_buffer')
 
 
+class StorageQuotaExceeded(Exception):
+    """The user has no room left in temporary storage."""
+
+
+class LocalDirStorage:
+    """
+    Temporary user files in {root}/{user_id}/IN|OUT on a local filesystem.
+
+    The root may be any mounted directory: a regular disk, tmpfs or
+    a volume shared between several bot replicas.
+    """
+
+    def __init__(self, root: str = 'temp'):
+        self.root = root
+
+    def get_user_dir(self, user_id) -> str:
+        return Path(self.root, str(user_id)).as_posix()
+
+    def create_user_folders(self, user_id) -> Tuple[str, str]:
+        """Create the user's IN/OUT folders if they don't exist."""
+        path_in = Path(self.root, str(user_id), INPUT_PATH_NAME)
+        path_in.mkdir(mode=0o777, parents=True, exist_ok=True)
+        path_out = Path(self.root, str(user_id), OUTPUT_PATH_NAME)
+        path_out.mkdir(mode=0o777, parents=True, exist_ok=True)
+        return path_in.as_posix(), path_out.as_posix()
+
+    def delete_files(self, folder_path) -> None:
+        """Delete all files in the specified folder."""
+        if not os.path.exists(folder_path):
+            return  # Folder does not exist, nothing to delete
+        for filename in os.listdir(folder_path):
+            file_path = os.path.join(folder_path, filename)
+            try:
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                logger.error(f"Error deleting file {file_path}: {e}")
+
+    def clear_user(self, user_id) -> None:
+        """Delete the user's IN/OUT files but keep the folders."""
+        user_dir = self.get_user_dir(user_id)
+        self.delete_files(os.path.join(user_dir, INPUT_PATH_NAME))
+        self.delete_files(os.path.join(user_dir, OUTPUT_PATH_NAME))
+        # Files directly in the user folder (e.g. the job manifest)
+        self.delete_files(user_dir)
+
+    def remove_user(self, user_id) -> int:
+        """
+        Remove the user's folder with everything in it.
+
+        Returns:
+            int: bytes freed
+        """
+        user_dir = self.get_user_dir(user_id)
+        freed = self.get_user_usage(user_id)
+        shutil.rmtree(user_dir, ignore_errors=True)
+        return freed
+
+    def get_user_usage(self, user_id) -> int:
+        """Bytes taken by the user's files."""
+        total = 0
+        for root, _, files in os.walk(self.get_user_dir(user_id)):
+            for filename in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, filename))
+                except OSError:
+                    pass  # File removed while scanning
+        return total
+
+    def list_users(self) -> List[str]:
+        """Names of user folders under the root."""
+        if not os.path.isdir(self.root):
+            return []
+        return [entry.name for entry in os.scandir(self.root) if entry.is_dir()]
+
+    def reserve(self, user_id, incoming_bytes: Optional[int]) -> int:
+        """
+        Reserve room for a file about to be written (no quota here).
+
+        Raises StorageQuotaExceeded if the file does not fit. May walk the
+        user's folder, so call it off the event loop.
+
+        Returns:
+            int: bytes to pass to release() once the file is on disk
+        """
+        return 0
+
+    def release(self, user_id, reserved: int) -> None:
+        """Drop a reservation made by reserve()."""
+
+
+class TmpfsStorage(LocalDirStorage):
+    """Local storage on tmpfs: keeps hot files in RAM-backed memory."""
+
+    def __init__(self, root: str = '/dev/shm/pdfconverter'):
+        super().__init__(root)
+        if not self._is_tmpfs(root):
+            logger.warning(f"{root} is not on tmpfs, files will go to disk")
+
+    @staticmethod
+    def _is_tmpfs(path: str) -> bool:
+        """Find the mount point of path in /proc/mounts and check its type."""
+        try:
+            with open('/proc/mounts') as mounts:
+                entries = [line.split() for line in mounts]
+        except OSError:
+            return False
+        path = os.path.abspath(path)
+        best_mount, best_type = '', None
+        for entry in entries:
+            mount_point, fs_type = entry[1], entry[2]
+            if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                    and len(mount_point) > len(best_mount):
+                best_mount, best_type = mount_point, fs_type
+        return best_type == 'tmpfs'
+
+
+class QuotaLocalDirStorage(LocalDirStorage):
+    """
+    Local storage that caps the disk space of every user.
+
+    Files still being downloaded are not on disk yet, so each one
+    reserves its size first; the check and the reservation happen under
+    the user's lock, and parallel uploads cannot all squeeze past the quota.
+    """
+
+    # Users share a fixed set of locks instead of one lock per user
+    LOCK_STRIPES = 64
+
+    def __init__(self, root: str = 'temp', quota_bytes: int = 200 * 1024 * 1024):
+        super().__init__(root)
+        self.quota_bytes = quota_bytes
+        self._reserved: Dict[str, int] = {}
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _user_lock(self, user_id) -> threading.Lock:
+        return self._locks[hash(str(user_id)) % self.LOCK_STRIPES]
+
+    def reserve(self, user_id, incoming_bytes: Optional[int]) -> int:
+        size = incoming_bytes or 0
+        with self._user_lock(user_id):
+            usage = self.get_user_usage(user_id) + self._reserved.get(str(user_id), 0)
+            if usage + size > self.quota_bytes:
+                raise StorageQuotaExceeded(
+                    f"User {user_id} uses {usage} of {self.quota_bytes} bytes")
+            self._reserved[str(user_id)] = self._reserved.get(str(user_id), 0) + size
+        return size
+
+    def release(self, user_id, reserved: int) -> None:
+        if not reserved:
+            return
+        with self._user_lock(user_id):
+            left = self._reserved.get(str(user_id), 0) - reserved
+            if left > 0:
+                self._reserved[str(user_id)] = left
+            else:
+                self._reserved.pop(str(user_id), None)
+
+
+STORAGE_BACKENDS = {
+    'local': LocalDirStorage,
+    'tmpfs': TmpfsStorage,
+    'quota': QuotaLocalDirStorage,
+}
+
+
+def create_storage(backend: str, root: Optional[str] = None,
+                   quota_bytes: Optional[int] = None) -> LocalDirStorage:
+    """Build the storage backend selected in the settings."""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown temp storage backend: {backend}")
+    kwargs = {}
+    if root:
+        kwargs['root'] = root
+    if backend == 'quota' and quota_bytes:
+        kwargs['quota_bytes'] = quota_bytes
+    storage = STORAGE_BACKENDS[backend](**kwargs)
+    logger.info(f"Temp storage: {backend} at {storage.root}")
+    return storage
+
+
+storage = create_storage(TEMP_STORAGE_BACKEND, TEMP_ROOT, TEMP_USER_QUOTA_BYTES)
+
+
 def create_temp_folder(user_id):
     """Create a temporary folder for the user if it doesn't exist."""
-    path_in = Path(f'temp/{user_id}/{INPUT_PATH_NAME}')
-    path_in.mkdir(mode=0o777, parents=True, exist_ok=True)
-    path_out = Path(f'temp/{user_id}/{OUTPUT_PATH_NAME}')
-    path_out.mkdir(mode=0o777, parents=True, exist_ok=True)
-    path = (path_in.as_posix(), path_out.as_posix())
-    return path
+    return storage.create_user_folders(user_id)
 
 
 def delete_files_in_folder(folder_path):
     """Delete all files in the specified folder."""
-    if not os.path.exists(folder_path):
-        return  # Folder does not exist, nothing to delete
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.error(f"Error deleting file {file_path}: {e}")
+    storage.delete_files(folder_path)
@@ -0,0 +1,179 @@
+import asyncio
+import signal
+from typing import Any, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import (SimpleRequestHandler,
+                                            setup_application)
+from aiohttp import web
+
+from core.core import (WEBHOOK_ACQUIRE_TIMEOUT, WEBHOOK_HOST,
+                       WEBHOOK_MAX_CONNECTIONS, WEBHOOK_MAX_IN_FLIGHT,
+                       WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL)
+from core.logger import setup_logger
+from utils.job_scheduler import job_scheduler
+from utils.metrics import WEBHOOK_REJECTED, WEBHOOK_UPDATES_IN_FLIGHT
+
+logger = setup_logger(__name__)
+
+# Сколько ждать обновления в обработке при остановке, сек
+DRAIN_TIMEOUT = 30
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением одновременных обновлений
+
+    Telegram получает ответ сразу, а обновление обрабатывается в фоне,
+    как в SimpleRequestHandler. Но фоновых задач не больше max_in_flight:
+    если за acquire_timeout слот не освободился, отвечаем 503, и Telegram
+    доставит обновление повторно (возможно, другой реплике).
+
+    Переопределён только публичный handle(); обновление передаётся
+    диспетчеру через feed_raw_update, без внутренних методов aiogram.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_in_flight: int,
+        acquire_timeout: float,
+        secret_token: Optional[str] = None,
+        **data: Any,
+    ):
+        super().__init__(dispatcher, bot, secret_token=secret_token, **data)
+        self.max_in_flight = max_in_flight
+        self.acquire_timeout = acquire_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(
+                request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), bot):
+            return web.Response(status=401, text='Unauthorized')
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            WEBHOOK_REJECTED.inc()
+            logger.warning(f"Лимит обновлений ({self.max_in_flight}) исчерпан, отвечаем 503")
+            return web.Response(status=503, text='Busy')
+
+        try:
+            update = await request.json(loads=bot.session.json_loads)
+        except Exception:
+            self._slots.release()
+            raise
+
+        task = asyncio.create_task(self._feed_update(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+        # Ответ обработчика в виде метода API выполняем отдельным запросом
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot=bot, result=result)
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка обработки обновления: {task.exception()}")
+
+    async def drain(self, timeout: float) -> None:
+        """Дождаться обновлений в обработке (при остановке)."""
+        if self._tasks:
+            logger.info(f"Ждём завершения {len(self._tasks)} обновлений...")
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+class WebhookServer:
+    """aiohttp-приложение: webhook, /healthz для балансировщика."""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot,
+                 host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, url: Optional[str] = WEBHOOK_URL,
+                 secret: Optional[str] = WEBHOOK_SECRET):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url
+        self.secret = secret
+        self.ready = False
+        self.handler = BoundedRequestHandler(
+            dispatcher, bot,
+            max_in_flight=WEBHOOK_MAX_IN_FLIGHT,
+            acquire_timeout=WEBHOOK_ACQUIRE_TIMEOUT,
+            secret_token=secret,
+        )
+        WEBHOOK_UPDATES_IN_FLIGHT.set_function(lambda: self.handler.in_flight)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Готовность принимать обновления (503 до старта и при остановке)."""
+        status: Dict[str, Any] = {
+            'status': 'ok' if self.ready else 'unavailable',
+            'updates_in_flight': self.handler.in_flight,
+            'max_in_flight': self.handler.max_in_flight,
+            'jobs_active': job_scheduler.active_count,
+            'jobs_queued': job_scheduler.queued_count,
+        }
+        return web.json_response(status, status=200 if self.ready else 503)
+
+    async def _register_webhook(self, app: web.Application) -> None:
+        if not self.url:
+            logger.info("WEBHOOK_URL не задан, setWebhook не вызываем")
+            return
+        await self.bot.set_webhook(
+            url=self.url.rstrip('/') + self.path,
+            secret_token=self.secret,
+            allowed_updates=self.dispatcher.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+        logger.info(f"Webhook зарегистрирован: {self.url.rstrip('/')}{self.path}")
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/healthz', self.handle_health)
+        self.handler.register(app, path=self.path)
+        # startup/shutdown диспетчера привязываются к приложению
+        setup_application(app, self.dispatcher, bot=self.bot)
+        app.on_startup.append(self._register_webhook)
+        return app
+
+    async def run(self) -> None:
+        """Слушать webhook до SIGTERM/SIGINT, затем корректно остановиться."""
+        if not self.secret:
+            logger.warning("WEBHOOK_SECRET не задан: запросы к webhook не проверяются")
+
+        runner = web.AppRunner(self.build_app(), access_log=None)
+        await runner.setup()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            self.ready = True
+            logger.info(f"Webhook слушает http://{self.host}:{self.port}{self.path}")
+            await stop.wait()
+        finally:
+            # Балансировщик перестаёт слать запросы, пока дорабатываем
+            self.ready = False
+            await self.handler.drain(timeout=DRAIN_TIMEOUT)
+            await runner.cleanup()
+            logger.info("Webhook остановлен")
@@ -0,0 +1,48 @@
+import asyncio
+import signal
+
+from core.core import METRICS_HOST, WORKER_METRICS_PORT
+from core.logger import setup_logger
+from database.engine import engine
+from database.init_db import init_database
+from utils.conversion_worker import conversion_worker
+from utils.converter_executor import conversion_executor
+from utils.metrics import MetricsServer, registry
+
+# Инициализация логгера
+logger = setup_logger(__name__)
+
+# Свой порт: воркер может работать на одной машине с ботом
+metrics_server = MetricsServer(registry, METRICS_HOST, WORKER_METRICS_PORT)
+
+
+async def main() -> None:
+    """
+    Воркер конвертации для CONVERSION_MODE=distributed
+
+    Берёт задачи из conversion_jobs, пока не получит SIGTERM/SIGINT,
+    после чего доделывает взятые задачи и выходит.
+    """
+    await init_database()
+    await metrics_server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await conversion_worker.run(stop)
+    finally:
+        await asyncio.to_thread(conversion_executor.shutdown, True)
+        await metrics_server.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logger.info("Starting worker...")
+    asyncio.run(main(), debug=False)
+    logger.info("Worker stopped.")